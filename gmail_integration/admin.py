@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.urls import reverse
+from django.utils.html import format_html
 from .models import GmailToken, Email, SyncStatus, Contact, Attachment
 
 
@@ -15,6 +17,12 @@ class AttachmentInline(admin.TabularInline):
     readonly_fields = ('filename', 'mime_type', 'size_bytes', 'get_size_display', 'created_at')
     fields = ('filename', 'mime_type', 'get_size_display', 'file', 'created_at')
     can_delete = True
+    max_num = 20
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).only(
+            'id', 'email', 'filename', 'mime_type', 'size_bytes', 'created_at', 'file'
+        )
 
 
 @admin.register(Email)
@@ -22,12 +30,31 @@ class EmailAdmin(admin.ModelAdmin):
     list_display = ('subject', 'sender_contact', 'date', 'is_read', 'label_list_display')
     list_filter = ('is_read', 'date', 'has_attachments')
     search_fields = ('subject', 'sender_contact__email', 'sender_contact__name', 'body_text')
-    readonly_fields = ('gmail_id', 'thread_id', 'created_at', 'updated_at')
+    readonly_fields = ('gmail_id', 'thread_id', 'created_at', 'updated_at', 'attachments_link')
     date_hierarchy = 'date'
     inlines = [AttachmentInline]
+    list_select_related = ('sender_contact',)
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # The changelist only renders a handful of columns - skip the large body fields there
+        match = request.resolver_match
+        if match and match.url_name == f'{self.opts.app_label}_{self.opts.model_name}_changelist':
+            queryset = queryset.select_related('sender_contact').only(
+                'id', 'account_email', 'subject', 'date', 'is_read', 'has_attachments', 'labels',
+                'sender_contact__email', 'sender_contact__name',
+            )
+        return queryset
+    
+    def attachments_link(self, obj):
+        # Emails with many attachments are easier to browse in the filtered attachment list
+        url = reverse('admin:gmail_integration_attachment_changelist')
+        return format_html('<a href="{}?email__id__exact={}">View all attachments</a>', url, obj.pk)
+    attachments_link.short_description = 'Attachments'
     
     def label_list_display(self, obj):
-        return ', '.join(obj.label_list)
+        # labels is a JSONField with default=list, so it is always a list here
+        return ', '.join(obj.labels)
     label_list_display.short_description = 'Labels'
 
 
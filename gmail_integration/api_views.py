@@ -1,7 +1,24 @@
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import connection
+from django.db.models import Q, Value
 from rest_framework import viewsets, permissions, filters
+from rest_framework.pagination import CursorPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Email, GmailToken, SyncStatus
-from .serializers import EmailSerializer, GmailTokenSerializer, SyncStatusSerializer
+from .utils.gmail_auth import get_accessible_accounts
+from .serializers import (
+    EmailSerializer, EmailListSerializer, EmailDetailSerializer,
+    GmailTokenSerializer, SyncStatusSerializer,
+)
+
+class EmailCursorPagination(CursorPagination):
+    """
+    Keyset pagination on date: each page is a range scan on the
+    (account_email, -date) index instead of an OFFSET that re-reads earlier rows.
+    """
+    page_size = 50
+    ordering = '-date'
+
 
 class EmailViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -10,18 +27,41 @@ class EmailViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Email.objects.all()
     serializer_class = EmailSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = EmailCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['account_email', 'is_read', 'has_attachments']
     search_fields = ['subject', 'body_text', 'sender_contact__email', 'sender_contact__name', 'snippet']
     ordering_fields = ['date', 'created_at']
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return EmailListSerializer
+        if self.action == 'retrieve':
+            return EmailDetailSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         user = self.request.user
-        if user.has_perm('gmail_integration.view_all_gmail_accounts'):
-            return Email.objects.all()
-        
-        user_accounts = GmailToken.objects.filter(user=user).values_list('email_account', flat=True)
-        return Email.objects.filter(account_email__in=user_accounts)
+        # Join the sender and fetch recipients up front so serializing a page doesn't
+        # issue per-row queries; the large body columns are only shipped for retrieve.
+        queryset = Email.objects.select_related('sender_contact')
+        if self.action != 'retrieve':
+            queryset = queryset.defer('body_text', 'body_html')
+        if connection.vendor == 'postgresql':
+            # Return recipient IDs as an array in the same query instead of a prefetch
+            queryset = queryset.annotate(
+                recipient_ids=ArrayAgg(
+                    'recipients__id',
+                    distinct=True,
+                    filter=Q(recipients__isnull=False),
+                    default=Value([]),
+                )
+            )
+        else:
+            queryset = queryset.prefetch_related('recipients')
+        # Same account rules as the web views (active accounts; all of them with
+        # view_all_gmail_accounts), memoized on request.user
+        return queryset.filter(account_email__in=get_accessible_accounts(user))
 
 class GmailTokenViewSet(viewsets.ModelViewSet):
     """
@@ -32,10 +72,12 @@ class GmailTokenViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
+        # The serializer never exposes token contents, so don't load them
+        queryset = GmailToken.objects.defer('token_data', 'encrypted_token_data')
         # Users only see their own tokens
         if self.request.user.has_perm('gmail_integration.view_all_gmail_accounts'):
-            return GmailToken.objects.all()
-        return GmailToken.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
 
 class SyncStatusViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GmailIntegrationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "gmail_integration"
+
+    def ready(self):
+        from . import signals  # noqa: F401
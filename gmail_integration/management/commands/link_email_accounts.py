@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from gmail_integration.models import Email, GmailToken
+
+
+class Command(BaseCommand):
+    help = 'Link existing emails to their GmailToken via account_link'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Starting data migration...')
+        count = 0
+        
+        # Stream tokens instead of materializing the whole table
+        tokens = GmailToken.objects.only('id', 'email_account').iterator(chunk_size=500)
+        for token in tokens:
+            self.stdout.write(f'Linking emails for {token.email_account}...')
+            updated = Email.objects.filter(account_email=token.email_account).update(account_link=token)
+            count += updated
+        
+        self.stdout.write(self.style.SUCCESS(f'Done. Updated {count} emails.'))
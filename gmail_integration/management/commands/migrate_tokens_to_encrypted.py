@@ -1,7 +1,10 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from gmail_integration.models import GmailToken
 from gmail_integration.utils.encryption import EncryptionUtils
 
+BATCH_SIZE = 500
+
 
 class Command(BaseCommand):
     help = 'Migrate plaintext tokens to encrypted format (GDPR compliance)'
@@ -17,7 +20,8 @@ class Command(BaseCommand):
         dry_run = options['dry_run']
         
         # Find all tokens that have plaintext data but no encrypted data
-        tokens_to_migrate = GmailToken.objects.filter(
+        # The user rides along in the same SELECT since every line we print names it
+        tokens_to_migrate = GmailToken.objects.select_related('user').filter(
             token_data__isnull=False
         ).exclude(
             encrypted_token_data__isnull=False,
@@ -41,31 +45,40 @@ class Command(BaseCommand):
         # Perform migration
         migrated = 0
         errors = 0
+        updates = []
         
-        for token in tokens_to_migrate:
-            try:
-                # Encrypt the plaintext token data
-                encrypted_data = EncryptionUtils.encrypt(token.token_data)
-                token.encrypted_token_data = encrypted_data
-                token.save(update_fields=['encrypted_token_data'])
-                
-                # Verify decryption works
-                decrypted = EncryptionUtils.decrypt(encrypted_data)
-                if decrypted == token.token_data:
-                    migrated += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✓ Migrated: {token.email_account} (User: {token.user.username})')
-                    )
-                else:
+        with transaction.atomic():
+            for token in tokens_to_migrate:
+                try:
+                    # Encrypt the plaintext token data
+                    encrypted_data = EncryptionUtils.encrypt(token.token_data)
+                    
+                    # Verify decryption works (in memory, before anything is written)
+                    decrypted = EncryptionUtils.decrypt(encrypted_data)
+                    if decrypted == token.token_data:
+                        token.encrypted_token_data = encrypted_data
+                        updates.append(token)
+                        migrated += 1
+                        self.stdout.write(
+                            self.style.SUCCESS(f'✓ Migrated: {token.email_account} (User: {token.user.username})')
+                        )
+                    else:
+                        errors += 1
+                        self.stdout.write(
+                            self.style.ERROR(f'✗ Verification failed: {token.email_account}')
+                        )
+                except Exception as e:
                     errors += 1
                     self.stdout.write(
-                        self.style.ERROR(f'✗ Verification failed: {token.email_account}')
+                        self.style.ERROR(f'✗ Error migrating {token.email_account}: {str(e)}')
                     )
-            except Exception as e:
-                errors += 1
-                self.stdout.write(
-                    self.style.ERROR(f'✗ Error migrating {token.email_account}: {str(e)}')
-                )
+                
+                if len(updates) >= BATCH_SIZE:
+                    GmailToken.objects.bulk_update(updates, ['encrypted_token_data'], batch_size=BATCH_SIZE)
+                    updates = []
+            
+            if updates:
+                GmailToken.objects.bulk_update(updates, ['encrypted_token_data'], batch_size=BATCH_SIZE)
         
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS(f'Migration complete: {migrated} migrated, {errors} errors'))
@@ -1,6 +1,11 @@
 from django.db import migrations
 import re
 
+CHUNK_SIZE = 1000
+M2M_BATCH_SIZE = 5000
+# Only the legacy address columns are read; skip the large body columns
+LEGACY_FIELDS = ('id', 'sender', 'sender_name', 'recipient', 'cc', 'bcc')
+
 def migrate_legacy_fields(apps, schema_editor):
     Email = apps.get_model('gmail_integration', 'Email')
     Contact = apps.get_model('gmail_integration', 'Contact')
@@ -16,18 +21,6 @@ def migrate_legacy_fields(apps, schema_editor):
         else:
             return email_str.strip(), ''
 
-    def get_or_create_contact(email_addr, name=''):
-        if not email_addr:
-            return None
-        contact, created = Contact.objects.get_or_create(
-            email=email_addr,
-            defaults={'name': name}
-        )
-        if not created and name and not contact.name:
-            contact.name = name
-            contact.save()
-        return contact
-
     def parse_recipients(recipient_str):
         if not recipient_str:
             return []
@@ -38,35 +31,64 @@ def migrate_legacy_fields(apps, schema_editor):
                 recipients.append(email_addr)
         return recipients
 
-    for email in Email.objects.all():
-        # Handle Sender
+    def parse_email(email):
         sender_email, sender_name_extracted = extract_email_and_name(email.sender)
         # Prefer the explicit sender_name field if it exists, otherwise use extracted name
         final_sender_name = email.sender_name if email.sender_name else sender_name_extracted
-        
-        sender_contact = get_or_create_contact(sender_email, final_sender_name)
-        email.sender_contact = sender_contact
 
         # Handle Recipients (To, CC, BCC)
-        all_recipients = []
-        all_recipients.extend(parse_recipients(email.recipient))
-        all_recipients.extend(parse_recipients(email.cc))
-        all_recipients.extend(parse_recipients(email.bcc))
+        all_recipients = set()
+        all_recipients.update(parse_recipients(email.recipient))
+        all_recipients.update(parse_recipients(email.cc))
+        all_recipients.update(parse_recipients(email.bcc))
+        return sender_email, final_sender_name, all_recipients
 
-        contact_objs = []
-        for recipient_email in set(all_recipients):
-            contact = get_or_create_contact(recipient_email)
-            if contact:
-                contact_objs.append(contact)
+    # Pass 1: collect every address (and the best known name) across all emails
+    contact_names = {}
+    for email in Email.objects.only(*LEGACY_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+        sender_email, sender_name, all_recipients = parse_email(email)
+        if sender_email and not contact_names.get(sender_email):
+            contact_names[sender_email] = sender_name
+        for recipient_email in all_recipients:
+            contact_names.setdefault(recipient_email, '')
 
-        # Save first to ensure ID matches (though M2M needs save first usually, update_or_create style)
-        # But here we are iterating existing objects.
-        email.save()
-        
-        # Determine if we can use set() on M2M in a migration.
-        # Ideally, we should add them.
-        email.recipients.set(contact_objs)
-        # set handles saving the M2M relation.
+    # Create missing contacts; existing ones keep their name unless it was empty
+    Contact.objects.bulk_create(
+        [Contact(email=addr, name=name) for addr, name in contact_names.items()],
+        ignore_conflicts=True,
+        batch_size=CHUNK_SIZE,
+    )
+    renamed = []
+    for contact in Contact.objects.filter(name='').only('id', 'email', 'name').iterator(chunk_size=CHUNK_SIZE):
+        name = contact_names.get(contact.email)
+        if name:
+            contact.name = name
+            renamed.append(contact)
+    Contact.objects.bulk_update(renamed, ['name'], batch_size=CHUNK_SIZE)
+    contact_ids = dict(Contact.objects.values_list('email', 'id'))
+
+    # Pass 2: link senders and recipients in batches
+    Recipient = Email.recipients.through
+    email_batch = []
+    recipient_rows = []
+
+    def flush():
+        Email.objects.bulk_update(email_batch, ['sender_contact'], batch_size=CHUNK_SIZE)
+        Recipient.objects.bulk_create(recipient_rows, ignore_conflicts=True, batch_size=M2M_BATCH_SIZE)
+        email_batch.clear()
+        recipient_rows.clear()
+
+    for email in Email.objects.only(*LEGACY_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+        sender_email, _, all_recipients = parse_email(email)
+        email.sender_contact_id = contact_ids.get(sender_email) if sender_email else None
+        email_batch.append(email)
+        recipient_rows.extend(
+            Recipient(email_id=email.id, contact_id=contact_ids[addr])
+            for addr in all_recipients
+        )
+        if len(email_batch) >= CHUNK_SIZE:
+            flush()
+    flush()
 
 class Migration(migrations.Migration):
 
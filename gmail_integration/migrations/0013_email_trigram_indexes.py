@@ -0,0 +1,45 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+TRIGRAM_INDEXES = [
+    GinIndex(fields=["subject"], name="email_subject_trgm", opclasses=["gin_trgm_ops"]),
+    GinIndex(fields=["body_text"], name="email_body_text_trgm", opclasses=["gin_trgm_ops"]),
+]
+
+
+def add_trigram_indexes(apps, schema_editor):
+    # pg_trgm GIN indexes only exist on PostgreSQL; other backends keep plain scans
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Email = apps.get_model("gmail_integration", "Email")
+    for index in TRIGRAM_INDEXES:
+        schema_editor.add_index(Email, index)
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Email = apps.get_model("gmail_integration", "Email")
+    for index in TRIGRAM_INDEXES:
+        schema_editor.remove_index(Email, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gmail_integration", "0012_alter_gmailtoken_options"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name="email", index=index)
+                for index in TRIGRAM_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(add_trigram_indexes, remove_trigram_indexes),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-16 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gmail_integration", "0013_email_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="syncstatus",
+            index=models.Index(
+                fields=["-last_sync"], name="gmail_integ_last_sy_d772ce_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="syncstatus",
+            index=models.Index(
+                fields=["account_email", "-last_sync"],
+                name="gmail_integ_account_c65907_idx",
+            ),
+        ),
+    ]
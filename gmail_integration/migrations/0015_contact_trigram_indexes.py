@@ -0,0 +1,44 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations
+
+TRIGRAM_INDEXES = [
+    GinIndex(fields=["name"], name="contact_name_trgm", opclasses=["gin_trgm_ops"]),
+    GinIndex(fields=["email"], name="contact_email_trgm", opclasses=["gin_trgm_ops"]),
+]
+
+
+def add_trigram_indexes(apps, schema_editor):
+    # pg_trgm GIN indexes only exist on PostgreSQL; other backends keep plain scans
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Contact = apps.get_model("gmail_integration", "Contact")
+    for index in TRIGRAM_INDEXES:
+        schema_editor.add_index(Contact, index)
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Contact = apps.get_model("gmail_integration", "Contact")
+    for index in TRIGRAM_INDEXES:
+        schema_editor.remove_index(Contact, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gmail_integration", "0014_syncstatus_last_sync_indexes"),
+    ]
+
+    operations = [
+        # pg_trgm itself is installed by 0013
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name="contact", index=index)
+                for index in TRIGRAM_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(add_trigram_indexes, remove_trigram_indexes),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gmail_integration", "0015_contact_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="email",
+            name="gmail_integ_thread__5917cc_idx",
+        ),
+        migrations.AddIndex(
+            model_name="email",
+            index=models.Index(
+                fields=["thread_id", "-date"], name="gmail_integ_thread__04126a_idx"
+            ),
+        ),
+    ]
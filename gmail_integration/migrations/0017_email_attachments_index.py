@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-16 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gmail_integration", "0016_email_thread_date_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="email",
+            index=models.Index(
+                fields=["account_email", "has_attachments", "-date"],
+                name="gmail_integ_account_acd9da_idx",
+            ),
+        ),
+    ]
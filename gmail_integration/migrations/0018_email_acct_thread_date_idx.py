@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-16 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gmail_integration", "0017_email_attachments_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="email",
+            index=models.Index(
+                fields=["account_email", "thread_id", "-date"],
+                name="email_acct_thread_date_idx",
+            ),
+        ),
+    ]
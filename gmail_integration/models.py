@@ -1,8 +1,22 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.core.cache import cache
 from django.utils import timezone
+from django.utils.functional import cached_property
 import json
 
+ACCOUNT_COLOR_CACHE_KEY = 'gmail_token_colors'
+ACCOUNT_COLOR_CACHE_TIMEOUT = 300  # 5 minutes
+
+BULK_UPSERT_BATCH_SIZE = 500
+# Columns overwritten when a synced message already exists
+EMAIL_UPSERT_FIELDS = [
+    'account_email', 'account_link', 'thread_id', 'subject', 'sender_contact',
+    'date', 'snippet', 'body_text', 'body_html', 'labels', 'is_read',
+    'has_attachments', 'updated_at',
+]
+
 
 class GmailToken(models.Model):
     """Store OAuth tokens for Gmail API authentication - Multi-Account Support"""
@@ -27,55 +41,84 @@ class GmailToken(models.Model):
         return f"{self.email_account} (User: {self.user.username})"
     
     def get_decrypted_token(self):
-        """Get decrypted token data (GDPR compliant)"""
+        """Get decrypted token data (GDPR compliant), decrypted once per instance"""
         from gmail_integration.utils.encryption import EncryptionUtils
         
-        # STRICT GDPR COMPLIANCE: Only decrypt from encrypted storage
-        if self.encrypted_token_data:
-            decrypted = EncryptionUtils.decrypt(self.encrypted_token_data)
-            if decrypted:
-                return decrypted
-        
-        # No plaintext fallback allowed
-        return None
+        if '_decrypted_token' not in self.__dict__:
+            decrypted = None
+            # STRICT GDPR COMPLIANCE: Only decrypt from encrypted storage
+            if self.encrypted_token_data:
+                decrypted = EncryptionUtils.decrypt(self.encrypted_token_data) or None
+            # No plaintext fallback allowed
+            self._decrypted_token = decrypted
+        return self._decrypted_token
     
     def set_encrypted_token(self, token_data):
         """Encrypt and save token data (GDPR compliant)"""
         from gmail_integration.utils.encryption import EncryptionUtils
         
+        self.__dict__.pop('_decrypted_token', None)
         if token_data:
             self.encrypted_token_data = EncryptionUtils.encrypt(token_data)
             # STRICT GDPR COMPLIANCE: Do NOT store plaintext
             # self.token_data serves only as a legacy field now
             self.token_data = None
     
+    def refresh_from_db(self, *args, **kwargs):
+        self.__dict__.pop('_decrypted_token', None)
+        super().refresh_from_db(*args, **kwargs)
+    
     @classmethod
     def get_token_for_user(cls, user):
         """Get active Gmail token for a specific user"""
-        token = cls.objects.filter(user=user, is_active=True).first()
-        if token:
-            return token.get_decrypted_token()
+        from gmail_integration.utils.encryption import EncryptionUtils
+        
+        # Only the ciphertext is needed - skip building a full model instance
+        encrypted = cls.objects.filter(user=user, is_active=True).values_list(
+            'encrypted_token_data', flat=True
+        ).first()
+        if encrypted:
+            return EncryptionUtils.decrypt(encrypted) or None
         return None
     
     @classmethod
     def save_token_for_user(cls, user, email_account, token_data):
         """Save or update token for a specific user (with encryption)"""
+        from gmail_integration.utils.encryption import EncryptionUtils
+        
+        defaults = {'is_active': True}
+        if token_data:
+            # STRICT GDPR COMPLIANCE: encrypt up front and clear plaintext in the same write
+            defaults['encrypted_token_data'] = EncryptionUtils.encrypt(token_data)
+            defaults['token_data'] = None
         token, created = cls.objects.update_or_create(
             user=user,
             email_account=email_account,
-            defaults={
-                'is_active': True,
-            }
+            defaults=defaults
         )
-        # Use encryption method
-        token.set_encrypted_token(token_data)
-        token.save()
         return token
     
     @classmethod
     def get_all_active_tokens(cls):
         """Get all active tokens for syncing"""
         return cls.objects.filter(is_active=True)
+    
+    @classmethod
+    def get_color_map(cls):
+        """Get {email_account: account_color} for all tokens (cached, one query on miss)"""
+        color_map = cache.get(ACCOUNT_COLOR_CACHE_KEY)
+        if color_map is None:
+            color_map = {}
+            # Keep the first token per account, matching filter().first() semantics
+            for email_account, account_color in cls.objects.order_by('-pk').values_list('email_account', 'account_color'):
+                color_map[email_account] = account_color
+            cache.set(ACCOUNT_COLOR_CACHE_KEY, color_map, ACCOUNT_COLOR_CACHE_TIMEOUT)
+        return color_map
+    
+    @classmethod
+    def clear_color_map_cache(cls):
+        """Invalidate the cached account color map"""
+        cache.delete(ACCOUNT_COLOR_CACHE_KEY)
 
 
 class Contact(models.Model):
@@ -88,10 +131,45 @@ class Contact(models.Model):
     def __str__(self):
         return f"{self.name} <{self.email}>" if self.name else self.email
 
+    @classmethod
+    def bulk_upsert(cls, contact_names, batch_size=BULK_UPSERT_BATCH_SIZE):
+        """
+        Create missing contacts and fill in empty names, in a fixed number of queries
+        
+        Args:
+            contact_names: {email: name} mapping ('' when the name is unknown)
+        
+        Returns:
+            dict: {email: Contact}
+        """
+        if not contact_names:
+            return {}
+        cls.objects.bulk_create(
+            [cls(email=addr, name=name) for addr, name in contact_names.items()],
+            ignore_conflicts=True,
+            batch_size=batch_size,
+        )
+        contacts = cls.objects.in_bulk(list(contact_names), field_name='email')
+        # Existing contacts keep their name unless it was empty
+        renamed = []
+        for addr, contact in contacts.items():
+            name = contact_names[addr]
+            if name and not contact.name:
+                contact.name = name
+                renamed.append(contact)
+        if renamed:
+            cls.objects.bulk_update(renamed, ['name'], batch_size=batch_size)
+        return contacts
+
     class Meta:
         verbose_name = "Contact"
         verbose_name_plural = "Contacts"
         ordering = ['email']
+        indexes = [
+            # Trigram indexes let the inbox search's ILIKE '%q%' use an index (PostgreSQL only)
+            GinIndex(fields=['name'], name='contact_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['email'], name='contact_email_trgm', opclasses=['gin_trgm_ops']),
+        ]
 
 
 class Email(models.Model):
@@ -123,8 +201,16 @@ class Email(models.Model):
         ordering = ['-date']
         indexes = [
             models.Index(fields=['-date']),
-            models.Index(fields=['thread_id']),
+            # Serves thread lookups ordered by date and the per-thread window in the thread list
+            models.Index(fields=['thread_id', '-date']),
             models.Index(fields=['account_email', '-date']),
+            models.Index(fields=['account_email', 'has_attachments', '-date']),
+            # Per-account thread ranking in the thread list
+            models.Index(fields=['account_email', 'thread_id', '-date'], name='email_acct_thread_date_idx'),
+            # Trigram indexes let icontains searches use an index on PostgreSQL
+            # (created only on PostgreSQL, see migration 0013)
+            GinIndex(fields=['subject'], name='email_subject_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['body_text'], name='email_body_text_trgm', opclasses=['gin_trgm_ops']),
         ]
     
     def __str__(self):
@@ -134,21 +220,64 @@ class Email(models.Model):
     
     def get_account_color_class(self):
         """Get CSS class for account color coding from the associated GmailToken"""
-        # Fetch the color from the database instead of hardcoding
-        token = GmailToken.objects.filter(email_account=self.account_email).first()
-        if token:
-            return token.account_color
-        return 'account-gray'
+        # Use the linked token when the caller already loaded it via select_related
+        if self.account_link_id and Email.account_link.is_cached(self):
+            return self.account_link.account_color
+        # Legacy rows without a link (or an unloaded link) use the cached color map
+        return self.get_account_color_class_from_map(GmailToken.get_color_map())
+    
+    def get_account_color_class_from_map(self, color_map):
+        """Get CSS class for account color coding from a pre-fetched color map"""
+        return color_map.get(self.account_email, 'account-gray')
+    
+    def save(self, *args, **kwargs):
+        # Labels may have been changed in place; rebuild the lookup set on next access
+        self.__dict__.pop('_label_set', None)
+        super().save(*args, **kwargs)
     
+    def refresh_from_db(self, *args, **kwargs):
+        self.__dict__.pop('_label_set', None)
+        super().refresh_from_db(*args, **kwargs)
+    
+    @cached_property
+    def _label_set(self):
+        """Labels as a set for O(1) membership checks"""
+        return set(self.labels) if isinstance(self.labels, list) else set()
+    
+    @classmethod
+    def bulk_upsert(cls, rows, batch_size=BULK_UPSERT_BATCH_SIZE):
+        """
+        Insert or update emails keyed by gmail_id (INSERT ... ON CONFLICT DO UPDATE)
+        
+        Args:
+            rows: list of dicts of Email field values, each with a gmail_id
+        
+        Returns:
+            dict: {gmail_id: Email} with only id and gmail_id loaded
+        """
+        if not rows:
+            return {}
+        cls.objects.bulk_create(
+            [cls(**row) for row in rows],
+            update_conflicts=True,
+            unique_fields=['gmail_id'],
+            update_fields=EMAIL_UPSERT_FIELDS,
+            batch_size=batch_size,
+        )
+        # Not every backend returns ids for upserted rows
+        return cls.objects.only('id', 'gmail_id').in_bulk(
+            [row['gmail_id'] for row in rows], field_name='gmail_id'
+        )
+
     @property
     def is_inbox(self):
         """Check if email is in inbox"""
-        return 'INBOX' in self.labels
+        return 'INBOX' in self._label_set
     
     @property
     def is_sent(self):
         """Check if email is sent"""
-        return 'SENT' in self.labels
+        return 'SENT' in self._label_set
     
     @property
     def label_list(self):
@@ -158,6 +287,20 @@ class Email(models.Model):
         return []
 
 
+# (MIME type fragment, icon) pairs checked in order by Attachment.icon_class
+ATTACHMENT_ICONS = (
+    ('pdf', '📄'),
+    ('image', '🖼️'),
+    ('word', '📝'),
+    ('document', '📝'),
+    ('excel', '📊'),
+    ('spreadsheet', '📊'),
+    ('zip', '📦'),
+    ('compressed', '📦'),
+)
+DEFAULT_ATTACHMENT_ICON = '📎'
+
+
 class Attachment(models.Model):
     """Store email attachments"""
     email = models.ForeignKey(Email, on_delete=models.CASCADE, related_name='attachments', help_text="Email this attachment belongs to")
@@ -191,18 +334,11 @@ class Attachment(models.Model):
     @property
     def icon_class(self):
         """Return icon class based on MIME type"""
-        if 'pdf' in self.mime_type:
-            return '📄'
-        elif 'image' in self.mime_type:
-            return '🖼️'
-        elif 'word' in self.mime_type or 'document' in self.mime_type:
-            return '📝'
-        elif 'excel' in self.mime_type or 'spreadsheet' in self.mime_type:
-            return '📊'
-        elif 'zip' in self.mime_type or 'compressed' in self.mime_type:
-            return '📦'
-        else:
-            return '📎'
+        mime_type = self.mime_type
+        return next(
+            (icon for fragment, icon in ATTACHMENT_ICONS if fragment in mime_type),
+            DEFAULT_ATTACHMENT_ICON
+        )
 
 
 
@@ -227,15 +363,24 @@ class SyncStatus(models.Model):
         verbose_name = "Sync Status"
         verbose_name_plural = "Sync Statuses"
         ordering = ['-last_sync']
+        indexes = [
+            models.Index(fields=['-last_sync']),
+            models.Index(fields=['account_email', '-last_sync']),
+        ]
     
     def __str__(self):
         account_str = f" [{self.account_email}]" if self.account_email else ""
         return f"Sync Status{account_str}: {self.status} at {self.last_sync}"
     
     @classmethod
-    def get_latest(cls):
-        """Get the latest sync status"""
-        return cls.objects.first()
+    def get_latest(cls, account_email=None):
+        """Get the latest sync status (optionally for a single account)"""
+        queryset = cls.objects.all()
+        if account_email:
+            queryset = queryset.filter(account_email=account_email)
+        return queryset.only(
+            'account_email', 'last_sync', 'status', 'history_id', 'emails_synced'
+        ).first()
     
     @classmethod
     def create_sync_record(cls, status='success', history_id='', emails_synced=0, error_message='', account_email=None):
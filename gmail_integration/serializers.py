@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Email, GmailToken, SyncStatus
+from rest_framework.relations import PKOnlyObject
+from .models import Contact, Email, GmailToken, SyncStatus
 
 class GmailTokenSerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,7 +8,24 @@ class GmailTokenSerializer(serializers.ModelSerializer):
         fields = ['id', 'email_account', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
+class RecipientIdsField(serializers.ManyRelatedField):
+    """
+    Recipients as a list of Contact IDs. Uses the `recipient_ids` array annotation
+    when the queryset provides one, otherwise falls back to the M2M manager.
+    """
+    def get_attribute(self, instance):
+        recipient_ids = getattr(instance, 'recipient_ids', None)
+        if recipient_ids is not None:
+            return [PKOnlyObject(pk=pk) for pk in recipient_ids]
+        return super().get_attribute(instance)
+
+
 class EmailSerializer(serializers.ModelSerializer):
+    recipients = RecipientIdsField(
+        child_relation=serializers.PrimaryKeyRelatedField(queryset=Contact.objects.all()),
+        required=False,
+    )
+
     class Meta:
         model = Email
         fields = [
@@ -17,6 +35,23 @@ class EmailSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['gmail_id', 'thread_id', 'date']
 
+
+class EmailListSerializer(EmailSerializer):
+    """Compact representation for list responses (snippet trimmed, no bodies)"""
+    SNIPPET_LENGTH = 200
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if data.get('snippet'):
+            data['snippet'] = data['snippet'][:self.SNIPPET_LENGTH]
+        return data
+
+
+class EmailDetailSerializer(EmailSerializer):
+    """Full representation including message bodies"""
+    class Meta(EmailSerializer.Meta):
+        fields = EmailSerializer.Meta.fields + ['body_text', 'body_html']
+
 class SyncStatusSerializer(serializers.ModelSerializer):
     class Meta:
         model = SyncStatus
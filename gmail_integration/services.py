@@ -1,12 +1,34 @@
-from typing import List, Dict, Any, Tuple, Optional
-from django.db.models import Q, Count, Max, Subquery, OuterRef, QuerySet
+from typing import BinaryIO, List, Dict, Any, Tuple, Optional
+import hashlib
+import io
+from django.core.cache import cache, caches
+from django.db import connection
+from django.db.models import Q, F, Count, Prefetch, Window, QuerySet, prefetch_related_objects
+from django.db.models.functions import RowNumber
 from django.contrib.auth.models import User, AbstractBaseUser, AnonymousUser
-from .models import Email, GmailToken
+from .models import Contact, Email, GmailToken
 from .utils.gmail_auth import handle_oauth_callback
 import logging
 
 logger = logging.getLogger(__name__)
 
+THREAD_COUNT_CACHE_TIMEOUT = 60  # 1 minute
+
+# Downloaded attachment bytes are kept briefly in their own cache alias
+# (settings.CACHES['attachments']), never on disk (GDPR)
+ATTACHMENT_CACHE_ALIAS = 'attachments'
+ATTACHMENT_CACHE_TIMEOUT = 300  # 5 minutes
+ATTACHMENT_CACHE_MAX_BYTES = 1024 * 1024  # larger files always come straight from Gmail
+
+# Columns rendered by the thread list; the bodies and the token payload
+# (account_link is only joined for the badge color) are never loaded
+THREAD_LIST_FIELDS = (
+    'id', 'account_email', 'thread_id', 'subject', 'date', 'snippet', 'labels',
+    'is_read', 'has_attachments', 'updated_at',
+    'sender_contact__name', 'sender_contact__email',
+    'account_link__account_color',
+)
+
 class AuthService:
     """
     Service to handle authentication logic separately from views
@@ -27,10 +49,10 @@ class AuthService:
         """
         # 1. Verify session validity
         if not session_user_id or session_user_id != current_user.id:
-            logger.warning(f"Session mismatch: stored={session_user_id}, current={current_user.id}")
+            logger.warning("Session mismatch: stored=%s, current=%s", session_user_id, current_user.id)
             return False, "Invalid session. Please try again."
         
-        logger.info(f"OAuth callback processing for user: {current_user.username}")
+        logger.info("OAuth callback processing for user: %s", current_user.username)
         
         # 2. Delegate to the low-level utility to exchange code for token
         success, email_account = handle_oauth_callback(
@@ -63,27 +85,19 @@ class EmailService:
         search_query: Optional[str] = None,
         page_number: int = 1,
         items_per_page: int = 20
-    ) -> Tuple[List[Dict[str, Any]], Any, QuerySet]:
+    ) -> Tuple[List[Dict[str, Any]], Any, Tuple[str, ...]]:
         """
         Retrieves email threads for a user, applying permissions, filters, and search.
         Returns (thread_list, page_obj, available_accounts).
         """
         from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+        from .utils.gmail_auth import get_accessible_accounts
 
         # 1. Determine accessible accounts
-        available_accounts: QuerySet
-        if user.has_perm('gmail_integration.view_all_gmail_accounts'):
-            # Authorized users see all active accounts
-            available_accounts = GmailToken.objects.filter(
-                is_active=True
-            ).values_list('email_account', flat=True).distinct()
-        else:
-            # Regular users only see their own accounts
-            user_tokens = GmailToken.objects.filter(
-                user=user, 
-                is_active=True
-            )
-            available_accounts = user_tokens.values_list('email_account', flat=True)
+        # Authorized users see all active accounts, regular users only their own.
+        # Materialized once: the filter below gets a literal IN list and the
+        # caller renders the same tuple
+        available_accounts = tuple(sorted(get_accessible_accounts(user)))
 
         # 2. Build base queryset
         emails = Email.objects.filter(account_email__in=available_accounts)
@@ -94,28 +108,48 @@ class EmailService:
 
         # 4. Apply Search Query (if provided)
         if search_query:
-            emails = emails.filter(
-                Q(sender_contact__name__icontains=search_query) |
-                Q(sender_contact__email__icontains=search_query) |
-                Q(recipients__name__icontains=search_query) |
-                Q(recipients__email__icontains=search_query)
-            ).distinct()
+            # Match the query against contacts once (trigram-indexed on PostgreSQL),
+            # then select emails by contact id instead of running ILIKE per email row
+            matching_contacts = Contact.objects.filter(
+                Q(name__icontains=search_query) |
+                Q(email__icontains=search_query)
+            ).values('pk')
+            # UNION of the two narrow id lookups instead of OR-ing them, so each
+            # branch can use its own index (sender FK / through-table contact FK)
+            sender_match = Email.objects.filter(
+                sender_contact_id__in=matching_contacts
+            ).order_by().values('id')
+            recipient_match = Email.recipients.through.objects.filter(
+                contact_id__in=matching_contacts
+            ).order_by().values('email_id')
+            emails = emails.filter(id__in=sender_match.union(recipient_match))
 
         # 5. Thread Aggregation
-        # Subquery to get the ID of the latest email per thread
-        latest_email_subquery = emails.filter(
-            thread_id=OuterRef('thread_id')
-        ).order_by('-date').values('id')[:1]
-        
-        # Aggregate threads with message count and latest email ID
-        threads_qs = emails.values('thread_id').annotate(
-            message_count=Count('id'),
-            latest_date=Max('date'),
-            latest_email_id=Subquery(latest_email_subquery)
-        ).order_by('-latest_date')
+        # One query: rank emails inside each thread and keep the latest one,
+        # carrying the thread's message count along as a window aggregate
+        threads_qs = emails.select_related('sender_contact', 'account_link').only(
+            *THREAD_LIST_FIELDS
+        ).annotate(
+            thread_rank=Window(
+                RowNumber(),
+                partition_by=F('thread_id'),
+                order_by=[F('date').desc(), F('id').desc()],
+            ),
+            message_count=Window(Count('id'), partition_by=F('thread_id')),
+        ).filter(thread_rank=1).order_by('-date', '-id')
 
         # 6. Apply Pagination
         paginator = Paginator(threads_qs, items_per_page)
+
+        # Counting threads doesn't need the window ranking: COUNT(DISTINCT thread_id)
+        # over the filtered emails is cheaper, and is reused briefly while the
+        # user pages through the same listing
+        count_key = EmailService._thread_count_cache_key(user, account_filter, search_query)
+        thread_count = cache.get(count_key)
+        if thread_count is None:
+            thread_count = emails.values('thread_id').distinct().count()
+            cache.set(count_key, thread_count, THREAD_COUNT_CACHE_TIMEOUT)
+        paginator.count = thread_count
         
         try:
             page_obj = paginator.page(page_number)
@@ -124,46 +158,43 @@ class EmailService:
         except EmptyPage:
             page_obj = paginator.page(paginator.num_pages)
             
-        # 7. Fetch details only for the current page
-        # Extract latest_email_ids from the paginated objects
-        page_threads = page_obj.object_list
-        latest_email_ids = [t['latest_email_id'] for t in page_threads if t['latest_email_id'] is not None]
-        
-        # Bulk fetch the Email objects
-        latest_emails = Email.objects.in_bulk(latest_email_ids)
-        
-        # 8. Build Result List
-        thread_list: List[Dict[str, Any]] = []
-        for thread in page_threads:
-            email_id = thread['latest_email_id']
-            if email_id in latest_emails:
-                email = latest_emails[email_id]
-                thread_list.append({
-                    'thread_id': thread['thread_id'],
-                    'message_count': thread['message_count'],
-                    'latest_email': email,
-                    'latest_date': thread['latest_date'],
-                    'first_subject': email.subject,
-                    'latest_snippet': email.snippet,
-                })
-        
-        
+        # 7. Build Result List
+        thread_list: List[Dict[str, Any]] = [
+            {
+                'thread_id': email.thread_id,
+                'message_count': email.message_count,
+                'latest_email': email,
+                'latest_date': email.date,
+                'first_subject': email.subject,
+                'latest_snippet': email.snippet,
+            }
+            for email in page_obj.object_list
+        ]
+
         return thread_list, page_obj, available_accounts
 
     @staticmethod
-    def get_thread_emails(user: User, thread_id: str) -> Optional[QuerySet]:
+    def _thread_count_cache_key(user, account_filter: str, search_query: Optional[str]) -> str:
+        digest = hashlib.md5(f'{account_filter}|{search_query or ""}'.encode()).hexdigest()
+        return f'thread_count:{user.pk}:{digest}'
+
+    @staticmethod
+    def get_thread_emails(user: User, thread_id: str) -> Optional[List[Email]]:
         """
         Get all emails in a thread if user has permission to view them.
+        The thread is loaded with a single query and returned as a list.
         """
         # 1. Get emails for thread
-        emails = Email.objects.filter(thread_id=thread_id).order_by('date')
+        emails = list(
+            Email.objects.filter(thread_id=thread_id).select_related('sender_contact').order_by('date')
+        )
         
-        if not emails.exists():
+        if not emails:
             return None
             
         # 2. Check permission (using one of the emails to check account)
         # Optimization: We check the first email's account
-        first_email = emails.first()
+        first_email = emails[0]
         from .utils.gmail_auth import is_authenticated_for_account
         
         # Check if user can view this account
@@ -173,26 +204,41 @@ class EmailService:
         return emails
 
     @staticmethod
-    def process_thread_attachments(emails: QuerySet) -> None:
+    def process_thread_attachments(emails: List[Email]) -> None:
         """
         Process emails to add a 'unique_attachments' attribute to each email object.
         This de-duplicates attachments by filename for display.
         """
+        from .models import Attachment
+
+        # One query for the whole thread instead of one per email. Rows are
+        # ordered by filename so the lowest id of each duplicate comes first.
+        attachments = Attachment.objects.order_by('email_id', 'filename', 'id')
+        if connection.vendor == 'postgresql':
+            # DISTINCT ON lets the database drop duplicate filenames per email
+            attachments = attachments.distinct('email_id', 'filename')
+        prefetch_related_objects(
+            emails, Prefetch('attachments', queryset=attachments, to_attr='unique_attachments')
+        )
+
         for email in emails:
             seen_filenames = set()
             unique_attachments = []
-            # Prefetching should be handled by caller if needed, essentially iterating relation here
-            for att in email.attachments.all():
+            for att in email.unique_attachments:
                 if att.filename not in seen_filenames:
                     unique_attachments.append(att)
                     seen_filenames.add(att.filename)
+            # Display in the order the attachments were stored
+            unique_attachments.sort(key=lambda att: att.id)
             email.unique_attachments = unique_attachments
 
     @staticmethod
-    def get_attachment_content(user: User, attachment_id: int) -> Tuple[Optional['Attachment'], Optional[bytes]]:
+    def get_attachment_content(user: User, attachment_id: int) -> Tuple[Optional['Attachment'], Optional[BinaryIO]]:
         """
-        Get attachment metadata and content if user has permission.
-        Fetches content directly from Gmail API.
+        Get attachment metadata and a readable file object if user has permission.
+        Content is fetched from Gmail API; attachments up to ATTACHMENT_CACHE_MAX_BYTES
+        are kept in the 'attachments' cache for ATTACHMENT_CACHE_TIMEOUT so repeat
+        downloads skip the API. Nothing is written to local storage.
         """
         from .models import Attachment
         from .utils.gmail_auth import is_authenticated_for_account, get_gmail_service
@@ -207,23 +253,38 @@ class EmailService:
         
         # Check permissions
         if not is_authenticated_for_account(user, email.account_email):
-            logger.warning(f"User {user.username} denied access to attachment {attachment_id}")
+            logger.warning("User %s denied access to attachment %s", user.username, attachment_id)
             return None, None
             
+        # Serve a recent download from the cache (after the permission check)
+        attachment_cache = caches[ATTACHMENT_CACHE_ALIAS]
+        content_key = f'gmail_attachment_content:{attachment.pk}'
+        file_data = attachment_cache.get(content_key)
+        if file_data is not None:
+            return attachment, io.BytesIO(file_data)
+            
         # Get service for the account
         service = get_gmail_service(account_email=email.account_email)
         if not service:
-            logger.error(f"Could not get service for {email.account_email} to download attachment")
+            logger.error("Could not get service for %s to download attachment", email.account_email)
             return attachment, None
             
         # Download from Gmail
+        # attachments.get has no media endpoint: the content arrives base64-encoded
+        # inside the JSON response, so it can only be decoded as a whole
         file_data = download_attachment(
             service, 
             email.gmail_id, 
             attachment.gmail_attachment_id
         )
+        if not file_data:
+            return attachment, None
+        
+        # Keep small files briefly so repeat downloads skip the (rate limited) Gmail round-trip
+        if len(file_data) <= ATTACHMENT_CACHE_MAX_BYTES:
+            attachment_cache.set(content_key, file_data, ATTACHMENT_CACHE_TIMEOUT)
         
-        return attachment, file_data
+        return attachment, io.BytesIO(file_data)
 
     @staticmethod
     def get_attachment_for_download(user: User, attachment_id: int) -> Optional['Attachment']:
@@ -261,30 +322,28 @@ class EmailService:
         1. Authenticates
         2. Creates message
         3. Sends via Gmail API
-        4. Syncs 'Sent' folder
+        4. Queues a background sync of the 'Sent' folder
         """
-        from .utils.gmail_auth import get_gmail_service
-        from .utils.gmail_api import create_message, send_email as send_gmail_api, fetch_emails
+        from .utils.gmail_auth import get_gmail_service, is_authenticated_for_account
+        from .utils.gmail_api import create_message, send_email as send_gmail_api
+        from django_q.tasks import async_task
+        from .tasks import sync_sent_folder_task
 
         if attachments is None:
             attachments = []
 
         # 1. Get service
-        # Ensure the user owns this account
-        if not user.has_perm('gmail_integration.view_all_gmail_accounts'):
-            has_permission = GmailToken.objects.filter(user=user, email_account=sender_email, is_active=True).exists()
-            if not has_permission:
-                logger.warning(f"User {user.username} prevented from sending as {sender_email}")
-                return False
+        # Ensure the user owns this account (or may use any account)
+        if not is_authenticated_for_account(user, sender_email):
+            logger.warning("User %s prevented from sending as %s", user.username, sender_email)
+            return False
         
         # For superusers/admins, we don't restrict to their own token - we find ANY valid token for the account
         # For regular users, strict ownership check applies
-        if user.has_perm('gmail_integration.view_all_gmail_accounts'):
-            service = get_gmail_service(user=None, account_email=sender_email)
-        else:
-            service = get_gmail_service(user=user, account_email=sender_email)
+        can_use_any_account = user.has_perm('gmail_integration.view_all_gmail_accounts')
+        service = get_gmail_service(user=None if can_use_any_account else user, account_email=sender_email)
         if not service:
-            logger.error(f"Could not authenticate with {sender_email}")
+            logger.error("Could not authenticate with %s", sender_email)
             return False
 
         # 2. Create message
@@ -295,13 +354,16 @@ class EmailService:
             sent_msg = send_gmail_api(service, 'me', msg)
             
             if sent_msg:
-                # 4. Trigger sync for Sent folder
-                # we don't await this, just let it run or run it here synchronously if it's fast
-                # The original view ran it synchronously
-                fetch_emails(service, sender_email, 'SENT', 1)
+                # 4. Trigger sync for Sent folder in the background so the
+                # response doesn't wait on another Gmail round-trip
+                try:
+                    async_task(sync_sent_folder_task, sender_email)
+                except Exception as e:
+                    # The message is already sent; the next full sync picks it up
+                    logger.error("Could not queue Sent folder sync for %s: %s", sender_email, e)
                 return True
             else:
                 return False
         except Exception as e:
-            logger.exception(f"Error checking/sending email: {e}")
+            logger.exception("Error checking/sending email: %s", e)
             return False
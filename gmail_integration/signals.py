@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import GmailToken
+
+
+@receiver([post_save, post_delete], sender=GmailToken)
+def invalidate_account_color_cache(sender, **kwargs):
+    """Drop the cached account color map whenever a token changes"""
+    GmailToken.clear_color_map_cache()
+
@@ -2,20 +2,48 @@
 Background tasks for Gmail integration using django-q2
 """
 import logging
-from .utils.gmail_api import sync_all_emails
+from django_q.tasks import async_task
+from .utils.gmail_api import get_active_account_emails, sync_account_emails
 
 logger = logging.getLogger(__name__)
 
 def sync_emails_task(max_inbox=100, max_sent=100):
     """
     Task to sync emails for all active accounts.
-    To be called via async_task.
+    To be called via async_task. Queues one sync_account_task per account
+    so accounts sync in parallel across the cluster workers.
     """
     logger.info("Background sync task started.")
+    account_emails = get_active_account_emails()
+    for account_email in account_emails:
+        async_task(sync_account_task, account_email, max_inbox, max_sent, group='gmail-sync')
+    logger.info(f"Background sync task queued {len(account_emails)} account syncs.")
+    return len(account_emails)
+
+
+def sync_account_task(account_email, max_inbox=100, max_sent=100):
+    """
+    Task to sync inbox and sent emails for a single account.
+    """
     try:
-        results = sync_all_emails(max_inbox=max_inbox, max_sent=max_sent)
-        logger.info(f"Background sync task completed. Synced {results.get('total', 0)} emails.")
+        results = sync_account_emails(account_email, max_inbox=max_inbox, max_sent=max_sent)
+        logger.info(f"Account sync for {account_email} completed. Synced {results.get('total', 0)} emails.")
         return results
     except Exception as e:
-        logger.error(f"Background sync task failed: {e}")
+        logger.error(f"Account sync for {account_email} failed: {e}")
         raise
+
+
+def sync_sent_folder_task(account_email, max_results=1):
+    """
+    Task to pull the latest sent message(s) for one account after sending.
+    To be called via async_task.
+    """
+    from .utils.gmail_auth import get_gmail_service
+    from .utils.gmail_api import fetch_emails
+
+    service = get_gmail_service(account_email=account_email)
+    if not service:
+        logger.error(f"Sent folder sync skipped: could not get service for {account_email}")
+        return 0
+    return fetch_emails(service, account_email, 'SENT', max_results)
@@ -1,6 +1,6 @@
 import json
 import base64
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from django.conf import settings
 
 class EncryptionUtils:
@@ -44,13 +44,14 @@ class EncryptionUtils:
             return None
             
         if isinstance(data, (dict, list)):
-            text = json.dumps(data)
+            # Compact separators keep the plaintext (and so the ciphertext) small
+            text = json.dumps(data, separators=(',', ':'))
         else:
             text = str(data)
             
-        cipher = cls.get_cipher()
-        encrypted_bytes = cipher.encrypt(text.encode())
-        return base64.urlsafe_b64encode(encrypted_bytes).decode()
+        cipher = cls._cipher or cls.get_cipher()
+        # A Fernet token is already url-safe base64 text; store it as is
+        return cipher.encrypt(text.encode()).decode()
 
     @classmethod
     def decrypt(cls, encrypted_str):
@@ -61,19 +62,21 @@ class EncryptionUtils:
             return None
             
         try:
-            cipher = cls.get_cipher()
-            # Handle potential url-safe decoding if we stored it that way
-            # We return urlsafe b64 string from encrypt, so:
-            encrypted_bytes = base64.urlsafe_b64decode(encrypted_str)
-            
-            decrypted_bytes = cipher.decrypt(encrypted_bytes)
+            cipher = cls._cipher or cls.get_cipher()
+            try:
+                decrypted_bytes = cipher.decrypt(encrypted_str)
+            except InvalidToken:
+                # Older values wrapped the Fernet token in a second layer of base64
+                decrypted_bytes = cipher.decrypt(base64.urlsafe_b64decode(encrypted_str))
             decrypted_text = decrypted_bytes.decode()
             
-            # Try parsing as JSON
-            try:
-                return json.loads(decrypted_text)
-            except json.JSONDecodeError:
-                return decrypted_text
+            # Only dicts/lists are stored as JSON; skip the parse attempt for plain strings
+            if decrypted_text[:1] in ('{', '['):
+                try:
+                    return json.loads(decrypted_text)
+                except json.JSONDecodeError:
+                    pass
+            return decrypted_text
                 
         except Exception as e:
             # Depending on security posture, might want to raise or return None
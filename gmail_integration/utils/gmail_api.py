@@ -4,28 +4,108 @@ Handles fetching, parsing, and syncing emails from Gmail
 """
 import base64
 import email
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
+from email.message import Message
+from email.utils import getaddresses, parseaddr, parsedate_to_datetime
 from datetime import datetime
+from django.db import connection, transaction
 from django.utils import timezone
 import logging
+import threading
 from .gmail_auth import get_gmail_service
 from ..models import Email, SyncStatus
 import bleach
+from bleach.sanitizer import Cleaner
 
 logger = logging.getLogger(__name__)
 
+# Google API Rate Limit Fix: batch requests are split into chunks of 20
+BATCH_CHUNK_SIZE = 20
 
-def parse_email_headers(headers):
-    """Extract common headers from email"""
-    header_dict = {}
-    for header in headers:
-        name = header.get('name', '').lower()
-        value = header.get('value', '')
-        header_dict[name] = value
-    return header_dict
+# Labels fetched by a full sync; incremental syncs follow the same mail
+SYNCED_LABELS = frozenset(['INBOX', 'SENT'])
+
+# History record types that can add mail or change stored labels/read state
+HISTORY_TYPES = ['messageAdded', 'labelAdded', 'labelRemoved']
+
+# Accounts synced concurrently by sync_all_emails (network-bound, so threads suffice)
+SYNC_MAX_WORKERS = 8
+
+
+# Headers read by parse_email_message
+MESSAGE_HEADERS = frozenset(['subject', 'from', 'to', 'cc', 'bcc', 'date'])
+
+# MIME nesting spelled out in the message field mask; parts below this depth
+# are returned whole, so parse_payload still sees every part
+MESSAGE_PART_DEPTH = 4
+
+
+def _message_part_fields(depth):
+    """Field mask for one payload part and its children down to `depth` levels"""
+    children = f'parts({_message_part_fields(depth - 1)})' if depth else 'parts'
+    return f'partId,mimeType,filename,headers(name,value),body(data,attachmentId,size),{children}'
+
+
+# Partial-response mask for format='full' messages: only what parse_email_message reads
+# (part headers are kept for the Content-Type charset)
+MESSAGE_FIELDS = f'id,threadId,snippet,labelIds,payload({_message_part_fields(MESSAGE_PART_DEPTH)})'
+
+
+# Allowlist for sanitizing stored email HTML
+ALLOWED_HTML_TAGS = frozenset([
+    'a', 'abbr', 'acronym', 'b', 'blockquote', 'br', 'code', 'div',
+    'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img',
+    'li', 'ol', 'p', 'pre', 'span', 'strong', 'table', 'tbody',
+    'td', 'th', 'thead', 'tr', 'ul', 'u'
+])
+ALLOWED_HTML_ATTRS = {
+    '*': ['class', 'style', 'title'],
+    'a': ['href', 'target', 'rel'],
+    'img': ['src', 'alt', 'width', 'height', 'style'],
+    'table': ['border', 'cellpadding', 'cellspacing', 'style'],
+    'td': ['colspan', 'rowspan', 'style'],
+    'th': ['colspan', 'rowspan', 'style'],
+    'div': ['style'],
+    'span': ['style'],
+    'p': ['style'],
+}
+
+# bleach Cleaners hold parser state and are not thread-safe, so one per thread
+_html_cleaners = threading.local()
+
+
+def get_html_cleaner():
+    """This thread's bleach Cleaner for email HTML, built on first use"""
+    cleaner = getattr(_html_cleaners, 'cleaner', None)
+    if cleaner is None:
+        cleaner = _html_cleaners.cleaner = Cleaner(
+            tags=ALLOWED_HTML_TAGS,
+            attributes=ALLOWED_HTML_ATTRS,
+            strip=True
+        )
+    return cleaner
+
+
+def parse_email_headers(headers, names=None):
+    """
+    Extract common headers from email
+    
+    Args:
+        headers: Gmail payload header list
+        names: Optional set of lowercase header names to keep (default: all)
+    """
+    lower = str.lower
+    if names is None:
+        return {lower(header.get('name', '')): header.get('value', '') for header in headers}
+    return {
+        name: header.get('value', '')
+        for header in headers
+        if (name := lower(header.get('name', ''))) in names
+    }
 
 
 def extract_email_and_name(email_str):
@@ -36,80 +116,111 @@ def extract_email_and_name(email_str):
     if not email_str:
         return '', ''
     
-    import re
-    # Pattern: Name <email@example.com>
-    match = re.match(r'(.+?)\s*<(.+?)>', email_str)
-    if match:
-        name = match.group(1).strip().strip('"')  # Remove quotes if present
-        email_addr = match.group(2).strip()
-        return email_addr, name
-    else:
-        # Just an email address
+    name, email_addr = parseaddr(email_str)
+    if not email_addr:
+        # Not RFC 5322 parseable; keep the raw value as the address
         return email_str.strip(), ''
+    return email_addr, name
 
 
 def parse_recipients(recipient_str):
     """
     Parse comma-separated recipients into a clean string
-    Handles: 'email1, Name <email2>, email3'
+    Handles: 'email1, Name <email2>, "Last, First" <email3>'
     Returns: comma-separated email addresses
     """
     if not recipient_str:
         return ''
     
-    recipients = []
-    # Split by comma
-    for part in recipient_str.split(','):
-        email_addr, _ = extract_email_and_name(part.strip())
-        if email_addr:
-            recipients.append(email_addr)
-    
-    return ', '.join(recipients)
+    return ', '.join(addr for _, addr in getaddresses([recipient_str]) if addr)
+
 
+def decode_base64_bytes(data):
+    """Decode base64 URL-safe string to raw bytes"""
+    # Add padding if needed
+    missing_padding = len(data) % 4
+    if missing_padding:
+        data += '=' * (4 - missing_padding)
+    return base64.urlsafe_b64decode(data)
 
-def decode_base64(data):
-    """Decode base64 URL-safe string"""
+
+def decode_base64(data, charset='utf-8'):
+    """Decode base64 URL-safe string to text in the given charset"""
     try:
-        # Add padding if needed
-        missing_padding = len(data) % 4
-        if missing_padding:
-            data += '=' * (4 - missing_padding)
-        return base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
+        raw = decode_base64_bytes(data)
     except Exception as e:
         logger.error(f"Error decoding base64: {e}")
         return ""
+    try:
+        return raw.decode(charset, errors='ignore')
+    except LookupError:
+        # Unknown charset label in the Content-Type header
+        return raw.decode('utf-8', errors='ignore')
 
 
-def parse_email_body(payload):
-    """Extract email body from payload"""
+def get_part_charset(part):
+    """Charset from a payload part's Content-Type header, defaulting to utf-8"""
+    for header in part.get('headers', ()):
+        if header.get('name', '').lower() == 'content-type':
+            content_type = Message()
+            content_type['Content-Type'] = header.get('value', '')
+            return content_type.get_content_charset('utf-8')
+    return 'utf-8'
+
+
+def parse_payload(payload):
+    """
+    Extract bodies and attachment metadata from a message payload in one walk
+    
+    Gmail's format='full' response already splits the MIME tree into `parts`,
+    so bodies are read straight from it - never re-parse raw MIME here.
+    
+    Returns:
+        (body_text, body_html, attachments); the first text/plain and text/html
+        parts in document order are the bodies
+    """
     body_text = ""
     body_html = ""
+    attachments = []
     
-    if 'body' in payload and 'data' in payload['body']:
-        # Simple body
-        decoded = decode_base64(payload['body']['data'])
-        if payload.get('mimeType') == 'text/html':
-            body_html = decoded
-        else:
-            body_text = decoded
-    
-    # Check for parts (multipart emails)
-    if 'parts' in payload:
-        for part in payload['parts']:
-            mime_type = part.get('mimeType', '')
-            
-            if mime_type == 'text/plain' and 'data' in part.get('body', {}):
-                body_text = decode_base64(part['body']['data'])
-            elif mime_type == 'text/html' and 'data' in part.get('body', {}):
-                body_html = decode_base64(part['body']['data'])
-            elif 'parts' in part:
-                # Recursive for nested parts
-                nested_text, nested_html = parse_email_body(part)
-                if not body_text:
-                    body_text = nested_text
+    # Depth-first walk in document order
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        mime_type = part.get('mimeType', '')
+        body = part.get('body', {})
+        data = body.get('data')
+        
+        if data:
+            if mime_type == 'text/html':
                 if not body_html:
-                    body_html = nested_html
+                    body_html = decode_base64(data, get_part_charset(part))
+            elif mime_type == 'text/plain' or part is payload:
+                # A single-part message body is text unless it's HTML
+                if not body_text:
+                    body_text = decode_base64(data, get_part_charset(part))
+        
+        # Named parts with a Gmail attachment ID are attachments (the root never is)
+        filename = part.get('filename', '')
+        if filename and part is not payload and body.get('attachmentId'):
+            attachments.append({
+                'attachment_id': body['attachmentId'],
+                'filename': filename,
+                'mime_type': part.get('mimeType', 'application/octet-stream'),
+                'size': body.get('size', 0)
+            })
+        
+        stack.extend(reversed(part.get('parts', ())))
     
+    return body_text, body_html, attachments
+
+
+def parse_email_body(payload):
+    """
+    Extract email body from payload
+    Returns: (body_text, body_html)
+    """
+    body_text, body_html, _ = parse_payload(payload)
     return body_text, body_html
 
 
@@ -122,7 +233,7 @@ def parse_email_message(message_data):
     snippet = message_data.get('snippet', '')
     
     payload = message_data.get('payload', {})
-    headers = parse_email_headers(payload.get('headers', []))
+    headers = parse_email_headers(payload.get('headers', []), MESSAGE_HEADERS)
     
     # Extract headers
     subject = headers.get('subject', '(No Subject)')
@@ -143,7 +254,6 @@ def parse_email_message(message_data):
     # Parse date
     try:
         # Gmail provides date in RFC 2822 format
-        from email.utils import parsedate_to_datetime
         email_date = parsedate_to_datetime(date_str)
         # Make timezone-aware
         if email_date.tzinfo is None:
@@ -152,8 +262,8 @@ def parse_email_message(message_data):
         logger.error(f"Error parsing date '{date_str}': {e}")
         email_date = timezone.now()
     
-    # Parse body
-    body_text, body_html = parse_email_body(payload)
+    # Parse bodies and attachment metadata in a single walk over the parts
+    body_text, body_html, attachments_metadata = parse_payload(payload)
     
     # Get labels
     labels = message_data.get('labelIds', [])
@@ -161,50 +271,21 @@ def parse_email_message(message_data):
     # Check if read
     is_read = 'UNREAD' not in labels
     
-    # Check for attachments
-    has_attachments = any(
-        part.get('filename') 
-        for part in payload.get('parts', []) 
-        if part.get('filename')
-    )
+    # has_attachments follows the rows we will store, including attachments
+    # nested inside multipart/* parts
+    has_attachments = bool(attachments_metadata)
     
     # Sanitize HTML to prevent XSS
-    if body_html:
+    if body_html and not body_html.isspace():
         try:
-            allowed_tags = [
-                'a', 'abbr', 'acronym', 'b', 'blockquote', 'br', 'code', 'div',
-                'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img',
-                'li', 'ol', 'p', 'pre', 'span', 'strong', 'table', 'tbody',
-                'td', 'th', 'thead', 'tr', 'ul', 'u'
-            ]
-            allowed_attrs = {
-                '*': ['class', 'style', 'title'],
-                'a': ['href', 'target', 'rel'],
-                'img': ['src', 'alt', 'width', 'height', 'style'],
-                'table': ['border', 'cellpadding', 'cellspacing', 'style'],
-                'td': ['colspan', 'rowspan', 'style'],
-                'th': ['colspan', 'rowspan', 'style'],
-                'div': ['style'],
-                'span': ['style'],
-                'p': ['style'],
-            }
-            # Cleaning the HTML
             # Note: For full CSS sanitization we would need more complex logic,
             # but this prevents script injection.
-            body_html = bleach.clean(
-                body_html, 
-                tags=allowed_tags, 
-                attributes=allowed_attrs, 
-                strip=True
-            )
+            body_html = get_html_cleaner().clean(body_html)
         except Exception as e:
             logger.error(f"Error sanitizing HTML for email {message_id}: {e}")
             # Fallback: escape everything if sanitization fails
             body_html = bleach.clean(body_html, tags=[], strip=True)
 
-    # Extract attachment metadata
-    attachments_metadata = extract_attachment_metadata(payload)
-
     return {
         'gmail_id': message_id,
         'thread_id': thread_id,
@@ -230,30 +311,7 @@ def extract_attachment_metadata(payload):
     Extract attachment metadata from email payload
     Returns list of dicts with attachment info
     """
-    attachments = []
-    
-    def process_parts(parts):
-        for part in parts:
-            # Check if part has filename (is an attachment)
-            filename = part.get('filename', '')
-            if filename and 'body' in part:
-                attachment_id = part['body'].get('attachmentId')
-                if attachment_id:
-                    attachments.append({
-                        'attachment_id': attachment_id,
-                        'filename': filename,
-                        'mime_type': part.get('mimeType', 'application/octet-stream'),
-                        'size': part['body'].get('size', 0)
-                    })
-            
-            # Recursively process nested parts
-            if 'parts' in part:
-                process_parts(part['parts'])
-    
-    if 'parts' in payload:
-        process_parts(payload['parts'])
-    
-    return attachments
+    return parse_payload(payload)[2]
 
 
 def download_attachment(service, message_id, attachment_id):
@@ -329,82 +387,112 @@ def save_email_to_db(email_data, service=None):
         email_data: Parsed email data dict
         service: Gmail API service (needed for downloading attachments)
     """
-    # 1. Handle Sender Contact
-    sender_email = email_data.get('sender_email', '')
-    sender_name = email_data.get('sender_name', '')
-    sender_contact = get_or_create_contact(sender_email, sender_name)
+    created = not Email.objects.filter(gmail_id=email_data['gmail_id']).exists()
+    save_emails_to_db([email_data], service=service)
+    email_obj = Email.objects.get(gmail_id=email_data['gmail_id'])
+    return email_obj, created
+
+
+@transaction.atomic
+def save_emails_to_db(email_data_list, service=None):
+    """
+    Save or update a batch of parsed emails with a fixed number of queries
     
-    # NEW: Link to GmailToken FK
-    from ..models import GmailToken
-    account_email_str = email_data.get('account_email')
-    account_token = GmailToken.objects.filter(email_account=account_email_str).first()
-
-    # Add to defaults/data
-    # Note: we filter defaults to only include model fields
-    defaults = {
-        'subject': email_data['subject'],
-        'date': email_data['date'],
-        'snippet': email_data['snippet'],
-        'body_text': email_data['body_text'],
-        'body_html': email_data['body_html'],
-        'labels': email_data['labels'],
-        'is_read': email_data['is_read'],
-        'has_attachments': email_data['has_attachments'],
-        'thread_id': email_data['thread_id'],
-        'account_email': account_email_str,
-        'account_link': account_token,
-        'sender_contact': sender_contact
-    }
+    Contacts, emails, recipient links and attachment metadata are each
+    written in bulk instead of once per message.
     
-    # 3. Save Email
-    email_obj, created = Email.objects.update_or_create(
-        gmail_id=email_data['gmail_id'],
-        defaults=defaults
-    )
+    Args:
+        email_data_list: Parsed email data dicts (with account_email set)
+        service: Gmail API service (attachment metadata is only stored when given)
     
-    # 4. Handle Recipients (M2M) - post save
-    all_recipients = []
-    all_recipients.extend(email_data.get('recipient_list', []))
-    all_recipients.extend(email_data.get('cc_list', []))
-    all_recipients.extend(email_data.get('bcc_list', []))
-    
-    # Create contacts and link
-    if all_recipients:
-        contact_objs = []
-        for email_addr in set(all_recipients): # dedup
-            c = get_or_create_contact(email_addr)
-            if c:
-                contact_objs.append(c)
-        
-        email_obj.recipients.set(contact_objs)
+    Returns:
+        Number of emails saved
+    """
+    from ..models import Attachment, Contact, GmailToken
     
-    # 5. Handle Attachments
-    attachments_metadata = email_data.get('attachments_metadata', [])
-    if attachments_metadata and service:
-        from ..models import Attachment
-        from django.core.files.base import ContentFile
-        
-        for att_meta in attachments_metadata:
-            # Check if attachment already exists
-            existing = Attachment.objects.filter(
-                email=email_obj,
-                gmail_attachment_id=att_meta['attachment_id']
-            ).first()
-            
-            if not existing:
-                # Create Attachment object (Metadata only)
-                attachment = Attachment(
-                    email=email_obj,
+    # Gmail can list the same message twice; keep the last copy
+    email_data_list = list({data['gmail_id']: data for data in email_data_list}.values())
+    if not email_data_list:
+        return 0
+    
+    # 1. Contacts (senders and recipients)
+    contact_names = {}
+    for data in email_data_list:
+        sender_email = data.get('sender_email', '')
+        if sender_email and not contact_names.get(sender_email):
+            contact_names[sender_email] = data.get('sender_name', '')
+        for key in ('recipient_list', 'cc_list', 'bcc_list'):
+            for email_addr in data.get(key, []):
+                if email_addr:
+                    contact_names.setdefault(email_addr, '')
+    contacts = Contact.bulk_upsert(contact_names)
+    
+    # 2. Account tokens (first token per account)
+    account_tokens = {}
+    accounts = {data.get('account_email') for data in email_data_list}
+    for token in GmailToken.objects.filter(email_account__in=accounts).order_by('-pk'):
+        account_tokens[token.email_account] = token
+    
+    # 3. Emails
+    rows = []
+    for data in email_data_list:
+        account_email_str = data.get('account_email')
+        rows.append({
+            'gmail_id': data['gmail_id'],
+            'subject': data['subject'],
+            'date': data['date'],
+            'snippet': data['snippet'],
+            'body_text': data['body_text'],
+            'body_html': data['body_html'],
+            'labels': data['labels'],
+            'is_read': data['is_read'],
+            'has_attachments': data['has_attachments'],
+            'thread_id': data['thread_id'],
+            'account_email': account_email_str,
+            'account_link': account_tokens.get(account_email_str),
+            'sender_contact': contacts.get(data.get('sender_email', '')),
+        })
+    emails = Email.bulk_upsert(rows)
+    email_ids = [email_obj.id for email_obj in emails.values()]
+    
+    # 4. Recipients (M2M) - replace the links, like recipients.set()
+    Recipient = Email.recipients.through
+    recipient_rows = []
+    for data in email_data_list:
+        email_obj = emails[data['gmail_id']]
+        addrs = set(data.get('recipient_list', []))
+        addrs.update(data.get('cc_list', []))
+        addrs.update(data.get('bcc_list', []))
+        for email_addr in addrs:
+            contact = contacts.get(email_addr)
+            if contact:
+                recipient_rows.append(Recipient(email_id=email_obj.id, contact_id=contact.id))
+    Recipient.objects.filter(email_id__in=email_ids).delete()
+    Recipient.objects.bulk_create(recipient_rows, ignore_conflicts=True)
+    
+    # 5. Attachments (metadata only, skipping ones already stored)
+    if service:
+        existing = set(
+            Attachment.objects.filter(email_id__in=email_ids).values_list('email_id', 'gmail_attachment_id')
+        )
+        new_attachments = []
+        for data in email_data_list:
+            email_obj = emails[data['gmail_id']]
+            for att_meta in data.get('attachments_metadata', []):
+                key = (email_obj.id, att_meta['attachment_id'])
+                if key in existing:
+                    continue
+                existing.add(key)
+                new_attachments.append(Attachment(
+                    email_id=email_obj.id,
                     gmail_attachment_id=att_meta['attachment_id'],
                     filename=att_meta['filename'],
                     mime_type=att_meta['mime_type'],
                     size_bytes=att_meta['size']
-                )
-                attachment.save()
-                
-                # logger.info(f"Saved attachment metadata: {att_meta['filename']} ({att_meta['size']} bytes)")
-        
-    return email_obj, created
+                ))
+        Attachment.objects.bulk_create(new_attachments)
+    
+    return len(emails)
 
 
 def fetch_email_detail(service, message_id):
@@ -415,7 +503,8 @@ def fetch_email_detail(service, message_id):
         message = service.users().messages().get(
             userId='me',
             id=message_id,
-            format='full'
+            format='full',
+            fields=MESSAGE_FIELDS
         ).execute()
         return message
     except Exception as e:
@@ -423,6 +512,143 @@ def fetch_email_detail(service, message_id):
         return None
 
 
+def fetch_messages_bulk(service, message_ids, batch_size=BATCH_CHUNK_SIZE, format='full', fields=MESSAGE_FIELDS):
+    """
+    Fetch messages through the Gmail batch endpoint, one HTTP round trip per chunk
+    
+    Args:
+        service: Authenticated Gmail service
+        message_ids: Gmail message IDs to fetch
+        batch_size: Messages per batch request (Gmail allows up to 100)
+        format: Gmail message format ('full', 'metadata', ...)
+        fields: Partial-response field mask (None for the whole resource)
+        
+    Yields:
+        List of message dicts for each chunk, in request order (failed messages are skipped)
+    """
+    total_chunks = (len(message_ids) + batch_size - 1) // batch_size
+    
+    for i in range(0, len(message_ids), batch_size):
+        chunk = message_ids[i:i + batch_size]
+        current_chunk = (i // batch_size) + 1
+        logger.debug(f"Processing chunk {current_chunk}/{total_chunks} ({len(chunk)} emails)...")
+        
+        responses = {}
+        
+        def batch_callback(request_id, response, exception):
+            if exception:
+                logger.error(f"Error in batch request {request_id}: {exception}")
+                return
+            responses[request_id] = response
+        
+        batch = service.new_batch_http_request(callback=batch_callback)
+        for message_id in chunk:
+            request_kwargs = {'userId': 'me', 'id': message_id, 'format': format}
+            if fields:
+                request_kwargs['fields'] = fields
+            batch.add(service.users().messages().get(**request_kwargs), request_id=message_id)
+        
+        # Execute batch chunk
+        try:
+            batch.execute()
+        except Exception as e:
+            logger.error(f"Error executing batch chunk {current_chunk}: {e}")
+        
+        yield [responses[message_id] for message_id in chunk if message_id in responses]
+
+
+def save_messages(service, account_email, message_ids):
+    """
+    Batch fetch the given messages and save them, one bulk save per chunk
+    
+    The next chunk is fetched in a background thread while the current one is
+    parsed and saved, so the Gmail round trip overlaps the DB work. Only that
+    thread touches the service, and only one batch is in flight at a time.
+    
+    Returns:
+        Number of emails saved
+    """
+    emails_saved = 0
+    chunks = fetch_messages_bulk(service, message_ids)
+    
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        pending = prefetcher.submit(next, chunks, None)
+        while (chunk := pending.result()) is not None:
+            pending = prefetcher.submit(next, chunks, None)
+            
+            email_data_list = []
+            for response in chunk:
+                try:
+                    # Parse email
+                    email_data = parse_email_message(response)
+                    
+                    # ADD ACCOUNT EMAIL TO DATA
+                    email_data['account_email'] = account_email
+                    email_data_list.append(email_data)
+                except Exception as e:
+                    logger.error(f"Error processing batch email response: {e}")
+            
+            try:
+                # Save the whole chunk at once (pass service for attachment metadata)
+                emails_saved += save_emails_to_db(email_data_list, service=service)
+                logger.debug(f"  Processed {emails_saved} emails...")
+            except Exception as e:
+                logger.error(f"Error saving batch of {len(email_data_list)} emails: {e}")
+    
+    return emails_saved
+
+
+def fetch_history_message_ids(service, start_history_id):
+    """
+    Collect messages added or relabelled since start_history_id (users.history.list)
+    
+    Only messages in SYNCED_LABELS, or already stored, are returned so that the
+    delta covers the same mail as a full INBOX/SENT fetch.
+    
+    Returns:
+        (message_ids, latest_history_id), or None if the history ID has expired
+    """
+    from googleapiclient.errors import HttpError
+    
+    candidates = {}  # message id -> label ids, in history order
+    history_id = start_history_id
+    page_token = None
+    
+    while True:
+        try:
+            response = service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=HISTORY_TYPES,
+                pageToken=page_token
+            ).execute()
+        except HttpError as e:
+            if e.resp.status == 404:
+                # Gmail only keeps about a week of history
+                return None
+            raise
+        
+        for record in response.get('history', []):
+            for key in ('messagesAdded', 'labelsAdded', 'labelsRemoved'):
+                for change in record.get(key, []):
+                    message = change['message']
+                    candidates[message['id']] = message.get('labelIds', [])
+        
+        history_id = response.get('historyId', history_id)
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+    
+    stored = set(
+        Email.objects.filter(gmail_id__in=list(candidates)).values_list('gmail_id', flat=True)
+    )
+    message_ids = [
+        message_id for message_id, labels in candidates.items()
+        if message_id in stored or SYNCED_LABELS.intersection(labels)
+    ]
+    return message_ids, history_id
+
+
 def fetch_emails(service, account_email, label='INBOX', max_results=100):
     """
     Fetch emails from Gmail using Batch API for performance
@@ -456,57 +682,7 @@ def fetch_emails(service, account_email, label='INBOX', max_results=100):
         
         logger.info(f"Batch fetching {len(messages)} emails from {label} for {account_email}...")
         
-        # Batch processing setup
-        emails_saved = 0
-        
-        def batch_callback(request_id, response, exception):
-            nonlocal emails_saved
-            if exception:
-                logger.error(f"Error in batch request {request_id}: {exception}")
-                return
-            
-            try:
-                # Parse email
-                email_data = parse_email_message(response)
-                
-                # ADD ACCOUNT EMAIL TO DATA
-                email_data['account_email'] = account_email
-                
-                # Save to database (pass service for attachment downloads)
-                email_obj, created = save_email_to_db(email_data, service=service)
-                emails_saved += 1
-                
-                # Log occasionally to avoid spamming
-                if emails_saved % 10 == 0:
-                    logger.debug(f"  Processed {emails_saved} emails...")
-                    
-            except Exception as e:
-                logger.error(f"Error processing batch email response: {e}")
-
-        # Create batch request
-        # Google API Rate Limit Fix: Split into chunks of 20
-        chunk_size = 20
-        total_chunks = (len(messages) + chunk_size - 1) // chunk_size
-        
-        for i in range(0, len(messages), chunk_size):
-            chunk = messages[i:i + chunk_size]
-            current_chunk = (i // chunk_size) + 1
-            logger.debug(f"Processing chunk {current_chunk}/{total_chunks} ({len(chunk)} emails)...")
-            
-            batch = service.new_batch_http_request(callback=batch_callback)
-            
-            for msg in chunk:
-                batch.add(service.users().messages().get(
-                    userId='me', 
-                    id=msg['id'], 
-                    format='full'
-                ))
-            
-            # Execute batch chunk
-            try:
-                batch.execute()
-            except Exception as e:
-                logger.error(f"Error executing batch chunk {current_chunk}: {e}")
+        emails_saved = save_messages(service, account_email, [msg['id'] for msg in messages])
                 
         logger.info(f"Batch sync complete for {account_email} ({label}): {emails_saved} messages saved.")
         return emails_saved
@@ -516,69 +692,135 @@ def fetch_emails(service, account_email, label='INBOX', max_results=100):
         return 0
 
 
-def sync_all_emails(max_inbox=100, max_sent=100):
+def sync_account_emails(account_email, max_inbox=100, max_sent=100, incremental=False):
     """
-    Sync emails for all active Gmail accounts
-    Returns dict with sync stats per account
+    Sync inbox and sent emails for one Gmail account
+    
+    With incremental=True, only changes since the last successful sync are
+    fetched (Gmail history API); a full fetch is used when there is no usable
+    history ID.
+    Returns dict with sync stats for the account
     """
-    from ..models import GmailToken
     from .gmail_auth import get_gmail_service
     
+    logger.info(f"Syncing account: {account_email}")
+    
+    # Get service for this specific account
+    service = get_gmail_service(account_email=account_email)
+    
+    if not service:
+        logger.error(f"⚠️  Could not get service for {account_email}")
+        return {'inbox': 0, 'sent': 0, 'total': 0, 'error': 'Service unavailable'}
+    
+    if incremental:
+        last_sync = SyncStatus.get_latest(account_email=account_email)
+        if last_sync and last_sync.status == 'success' and last_sync.history_id:
+            try:
+                delta = fetch_history_message_ids(service, last_sync.history_id)
+            except Exception as e:
+                logger.error(f"Error reading history for {account_email}: {e}")
+                delta = None
+            
+            if delta is not None:
+                message_ids, history_id = delta
+                changed_count = save_messages(service, account_email, message_ids) if message_ids else 0
+                SyncStatus.create_sync_record(
+                    status='success',
+                    history_id=history_id,
+                    emails_synced=changed_count,
+                    account_email=account_email
+                )
+                logger.info(f"✓ {account_email}: {changed_count} changed since history {last_sync.history_id}")
+                return {'changed': changed_count, 'total': changed_count, 'history_id': history_id}
+            
+            logger.info(f"History for {account_email} unavailable, running full sync")
+    
+    # Sync inbox and sent for this account
+    inbox_count = fetch_emails(service, account_email, 'INBOX', max_inbox)
+    sent_count = fetch_emails(service, account_email, 'SENT', max_sent)
+    
+    account_total = inbox_count + sent_count
+    
+    # Get history ID for this account
+    history_id = ''
+    try:
+        profile = service.users().getProfile(userId='me').execute()
+        history_id = profile.get('historyId', '')
+    except Exception as e:
+        logger.error(f"Error getting history ID for {account_email}: {e}")
+    
+    # Create sync record for this account
+    SyncStatus.create_sync_record(
+        status='success',
+        history_id=history_id,
+        emails_synced=account_total,
+        account_email=account_email
+    )
+    
+    logger.info(f"✓ {account_email}: {inbox_count} inbox, {sent_count} sent")
+    
+    return {
+        'inbox': inbox_count,
+        'sent': sent_count,
+        'total': account_total,
+        'history_id': history_id
+    }
+
+
+def get_active_account_emails():
+    """Distinct email addresses of all active Gmail accounts"""
+    from ..models import GmailToken
+    
+    return list(
+        GmailToken.get_all_active_tokens().order_by('email_account')
+        .values_list('email_account', flat=True).distinct()
+    )
+
+
+def _sync_account_in_thread(account_email, max_inbox, max_sent, incremental):
+    """Run sync_account_emails in a worker thread, closing its DB connection afterwards"""
+    try:
+        return sync_account_emails(account_email, max_inbox, max_sent, incremental)
+    finally:
+        connection.close()
+
+
+def sync_all_emails(max_inbox=100, max_sent=100, incremental=False):
+    """
+    Sync emails for all active Gmail accounts, several accounts at a time
+    Returns dict with sync stats per account
+    """
     logger.info("Starting multi-account email sync...")
     
-    # Get all active tokens
-    active_tokens = GmailToken.get_all_active_tokens()
+    account_emails = get_active_account_emails()
     
-    if not active_tokens.exists():
+    if not account_emails:
         logger.warning("⚠️  No active Gmail accounts found. Please connect a Gmail account first.")
         return {'total': 0, 'accounts': {}}
     
+    # Each account gets its own thread and Gmail service; a service is not
+    # thread-safe, so INBOX and SENT stay sequential within an account.
     sync_results = {}
-    total_synced = 0
-    
-    for token in active_tokens:
-        account_email = token.email_account
-        logger.info(f"Syncing account: {account_email}")
-        
-        # Get service for this specific account
-        service = get_gmail_service(account_email=account_email)
-        
-        if not service:
-            logger.error(f"⚠️  Could not get service for {account_email}")
-            sync_results[account_email] = {'inbox': 0, 'sent': 0, 'total': 0, 'error': 'Service unavailable'}
-            continue
-        
-        # Sync inbox and sent for this account
-        inbox_count = fetch_emails(service, account_email, 'INBOX', max_inbox)
-        sent_count = fetch_emails(service, account_email, 'SENT', max_sent)
-        
-        account_total = inbox_count + sent_count
-        total_synced += account_total
-        
-        # Get history ID for this account
-        history_id = ''
-        try:
-            profile = service.users().getProfile(userId='me').execute()
-            history_id = profile.get('historyId', '')
-        except Exception as e:
-            logger.error(f"Error getting history ID for {account_email}: {e}")
-        
-        # Create sync record for this account
-        SyncStatus.create_sync_record(
-            status='success',
-            history_id=history_id,
-            emails_synced=account_total,
-            account_email=account_email
-        )
-        
-        sync_results[account_email] = {
-            'inbox': inbox_count,
-            'sent': sent_count,
-            'total': account_total,
-            'history_id': history_id
+    with ThreadPoolExecutor(max_workers=min(SYNC_MAX_WORKERS, len(account_emails))) as executor:
+        futures = {
+            executor.submit(_sync_account_in_thread, account_email, max_inbox, max_sent, incremental): account_email
+            for account_email in account_emails
         }
-        
-        logger.info(f"✓ {account_email}: {inbox_count} inbox, {sent_count} sent")
+        for future in as_completed(futures):
+            account_email = futures[future]
+            try:
+                sync_results[account_email] = future.result()
+            except Exception as e:
+                # One failing account (revoked token, Gmail 5xx...) must not abort the others
+                logger.error(f"Sync failed for {account_email}: {e}")
+                SyncStatus.create_sync_record(
+                    status='error',
+                    error_message=str(e),
+                    account_email=account_email
+                )
+                sync_results[account_email] = {'inbox': 0, 'sent': 0, 'total': 0, 'error': str(e)}
+    
+    total_synced = sum(result['total'] for result in sync_results.values())
     
     logger.info(f"Multi-account sync complete: {total_synced} total emails across {len(sync_results)} accounts")
     
@@ -591,11 +833,11 @@ def sync_all_emails(max_inbox=100, max_sent=100):
 def check_for_new_emails():
     """
     Check and sync all active accounts
-    Simplified version - just triggers full sync for all accounts
+    Fetches only changes since each account's last sync where possible
     Returns True if sync was performed
     """
     logger.info("Checking for new emails across all accounts...")
-    result = sync_all_emails()
+    result = sync_all_emails(incremental=True)
     return result['total'] > 0
 
 
@@ -618,7 +860,8 @@ def create_message(sender, to, subject, message_text, cc=None, bcc=None, attachm
     if attachments is None:
         attachments = []
     
-    message = MIMEMultipart()
+    # Plain text-only mail needs no multipart wrapper
+    message = MIMEMultipart() if attachments else MIMEText(message_text)
     message['to'] = to
     message['from'] = sender
     message['subject'] = subject
@@ -628,9 +871,9 @@ def create_message(sender, to, subject, message_text, cc=None, bcc=None, attachm
     if bcc:
         message['bcc'] = bcc
 
-    # Attach message text
-    msg = MIMEText(message_text)
-    message.attach(msg)
+    if attachments:
+        # Attach message text
+        message.attach(MIMEText(message_text))
     
     # Attach files
     for attachment in attachments:
@@ -4,17 +4,42 @@ Handles OAuth 2.0 flow for Gmail API access with user-specific tokens
 """
 import os
 import json
+from functools import lru_cache
 from django.conf import settings
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
 import logging
 from ..models import GmailToken
 
 logger = logging.getLogger(__name__)
 
 
+
+@lru_cache(maxsize=None)
+def _gmail_discovery_doc():
+    """Gmail v1 discovery document bundled with googleapiclient, read once per process"""
+    return discovery_cache.get_static_doc('gmail', 'v1')
+
+
+def build_gmail_service(creds):
+    """
+    Build a Gmail API service for the given credentials.
+    
+    Only the static discovery document is shared between calls; the service
+    (and its HTTP client) is per call since httplib2 is not thread-safe.
+    """
+    return build_from_document(_gmail_discovery_doc(), credentials=creds)
+
+
+def _save_refreshed_token(token_obj, creds):
+    """Persist refreshed credentials, writing only the encrypted token columns"""
+    token_obj.set_encrypted_token(json.loads(creds.to_json()))
+    token_obj.save(update_fields=['encrypted_token_data', 'token_data', 'updated_at'])
+
+
 def get_gmail_service(user=None, account_email=None):
     """
     Get authenticated Gmail API service for a specific user or account
@@ -26,22 +51,26 @@ def get_gmail_service(user=None, account_email=None):
     Returns:
         Gmail service object or None if not authenticated
     """
+    # Only the columns needed to build (and refresh) credentials
+    tokens = GmailToken.objects.only('id', 'email_account', 'encrypted_token_data')
     if user and account_email:
         # Get token for specific user and account
-        token_obj = GmailToken.objects.filter(user=user, email_account=account_email, is_active=True).first()
+        token_obj = tokens.filter(user=user, email_account=account_email, is_active=True).first()
     elif account_email:
         # Get token by exact account email (first available)
-        token_obj = GmailToken.objects.filter(email_account=account_email, is_active=True).first()
+        token_obj = tokens.filter(email_account=account_email, is_active=True).first()
     elif user:
         # Get any active token for user
-        token_obj = GmailToken.objects.filter(user=user, is_active=True).first()
+        token_obj = tokens.filter(user=user, is_active=True).first()
     else:
         return None
     
     if not token_obj:
         return None
     
-    token_data = token_obj.token_data
+    token_data = token_obj.get_decrypted_token()
+    if not token_data:
+        return None
     
     # Create credentials from stored token
     creds = Credentials.from_authorized_user_info(token_data, settings.GMAIL_SCOPES)
@@ -50,9 +79,8 @@ def get_gmail_service(user=None, account_email=None):
     if creds and creds.expired and creds.refresh_token:
         try:
             creds.refresh(Request())
-            # Save refreshed token
-            token_obj.token_data = json.loads(creds.to_json())
-            token_obj.save()
+            # Save refreshed token (encrypted only)
+            _save_refreshed_token(token_obj, creds)
         except Exception as e:
             logger.error(f"Error refreshing token for {token_obj.email_account}: {e}")
             return None
@@ -61,7 +89,7 @@ def get_gmail_service(user=None, account_email=None):
         return None
     
     # Build and return Gmail service
-    service = build('gmail', 'v1', credentials=creds)
+    service = build_gmail_service(creds)
     return service
 
 
@@ -136,7 +164,7 @@ def handle_oauth_callback(authorization_response, state=None, user=None):
         token_data = json.loads(creds.to_json())
         
         # Get the Gmail account email address
-        service = build('gmail', 'v1', credentials=creds)
+        service = build_gmail_service(creds)
         profile = service.users().getProfile(userId='me').execute()
         email_account = profile.get('emailAddress')
         
@@ -202,24 +230,26 @@ def refresh_token_if_needed(user=None, account_email=None):
     Returns:
         bool: True if token is valid, False otherwise
     """
+    tokens = GmailToken.objects.only('id', 'email_account', 'encrypted_token_data')
     if account_email:
-        token_obj = GmailToken.objects.filter(email_account=account_email, is_active=True).first()
+        token_obj = tokens.filter(email_account=account_email, is_active=True).first()
     elif user:
-        token_obj = GmailToken.objects.filter(user=user, is_active=True).first()
+        token_obj = tokens.filter(user=user, is_active=True).first()
     else:
         return False
     
     if not token_obj:
         return False
     
-    token_data = token_obj.token_data
+    token_data = token_obj.get_decrypted_token()
+    if not token_data:
+        return False
     creds = Credentials.from_authorized_user_info(token_data, settings.GMAIL_SCOPES)
     
     if creds.expired and creds.refresh_token:
         try:
             creds.refresh(Request())
-            token_obj.token_data = json.loads(creds.to_json())
-            token_obj.save()
+            _save_refreshed_token(token_obj, creds)
             return True
         except Exception as e:
             logger.error(f"Error refreshing token for {token_obj.email_account}: {e}")
@@ -228,6 +258,45 @@ def refresh_token_if_needed(user=None, account_email=None):
     return creds.valid
 
 
+def get_accessible_accounts(user):
+    """
+    Get the Gmail accounts a user may read from and send as
+    
+    Users with view_all_gmail_accounts get every active account, everyone else
+    only their own. The result is memoized on the user object, which Django
+    builds fresh for each request, so permission or token changes apply from
+    the next request on.
+    
+    Args:
+        user: Django User object
+    
+    Returns:
+        frozenset: email_account addresses
+    """
+    accounts = getattr(user, '_gmail_accessible_accounts', None)
+    if accounts is None:
+        tokens = GmailToken.objects.filter(is_active=True)
+        if not user.has_perm('gmail_integration.view_all_gmail_accounts'):
+            tokens = tokens.filter(user=user)
+        accounts = frozenset(tokens.values_list('email_account', flat=True))
+        user._gmail_accessible_accounts = accounts
+    return accounts
+
+
+def is_authenticated_for_account(user, account_email):
+    """
+    Check if user may access a specific Gmail account
+    
+    Args:
+        user: Django User object
+        account_email: Gmail account email
+    
+    Returns:
+        bool: True if the account is accessible to the user
+    """
+    return account_email in get_accessible_accounts(user)
+
+
 def get_all_services_for_user(user):
     """
     Get Gmail services for all active accounts of a user
@@ -134,7 +134,7 @@ def thread_view(request: HttpRequest, thread_id: str) -> HttpResponse:
         return HttpResponse("Thread not found or permission denied", status=404)
     
     # Get thread metadata
-    first_email = emails.first()
+    first_email = emails[0]
     
     # Process unique attachments using service
     EmailService.process_thread_attachments(emails)
@@ -143,7 +143,7 @@ def thread_view(request: HttpRequest, thread_id: str) -> HttpResponse:
         'emails': emails,
         'thread_id': thread_id,
         'subject': first_email.subject,
-        'message_count': emails.count(),
+        'message_count': len(emails),
         'active_page': 'inbox' if first_email.is_inbox else 'sent'
     }
     
@@ -294,29 +294,28 @@ def download_attachment(request: HttpRequest, attachment_id: int) -> HttpRespons
     Download email attachment with permission check
     Streams directly from Gmail API -> User (No local storage)
     """
-    from .models import Attachment
     from django.http import FileResponse, Http404
-    import io
     
     # Get attachment content
-    attachment, file_data = EmailService.get_attachment_content(request.user, attachment_id)
+    attachment, file_obj = EmailService.get_attachment_content(request.user, attachment_id)
     
     if not attachment:
         # Not found or permission denied
         return HttpResponse("Attachment not found or permission denied", status=403)
     
-    if not file_data:
+    if not file_obj:
         # Metadata exists but download failed (or service unavailable)
         logger.error(f"Failed to download content for attachment {attachment_id}")
         return HttpResponse("Error downloading file from Gmail. Please try again later.", status=502)
     
-    # Serve file from memory
+    # FileResponse streams the file object in blocks and closes it when done
     try:
-        # Wrap bytes in BytesIO to mimic a file
-        file_stream = io.BytesIO(file_data)
-        
-        response = FileResponse(file_stream, content_type=attachment.mime_type)
-        response['Content-Disposition'] = f'attachment; filename="{attachment.filename}"'
+        response = FileResponse(
+            file_obj,
+            as_attachment=True,
+            filename=attachment.filename,
+            content_type=attachment.mime_type
+        )
         logger.info(f"User {request.user.username} downloaded attachment: {attachment.filename}")
         return response
     except Exception as e:
@@ -170,6 +170,23 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Caches
+# The default cache holds small shared lookups (inbox row fragments, thread
+# counts, account colors). Downloaded attachment bytes get their own small
+# pool so a few downloads never cull those entries. At most MAX_ENTRIES files
+# of up to ATTACHMENT_CACHE_MAX_BYTES (gmail_integration/services.py) are kept
+# per process.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "attachments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "gmail-attachments",
+        "OPTIONS": {"MAX_ENTRIES": 20},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -84,3 +84,14 @@ def sync_status():
         emails_synced=10
     )
     return status
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Keep cached lookups from leaking between tests."""
+    from django.core.cache import caches
+    for cache in caches.all():
+        cache.clear()
+    yield
+    for cache in caches.all():
+        cache.clear()
@@ -42,6 +42,26 @@ class TestEmailViewSet:
         
         assert response.status_code == status.HTTP_200_OK
         assert response.data['subject'] == sample_email.subject
+        assert response.data['body_text'] == sample_email.body_text
+
+    def test_list_emails_omits_bodies(self, api_client, test_user, gmail_token, sample_email):
+        """Test list responses don't include the message bodies."""
+        api_client.force_authenticate(user=test_user)
+        response = api_client.get(reverse('email-list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'body_html' not in response.data['results'][0]
+        assert 'body_text' not in response.data['results'][0]
+
+    def test_list_emails_skips_inactive_accounts(self, api_client, test_user, gmail_token, sample_email):
+        """Test emails of a deactivated account are hidden, as in the web views."""
+        gmail_token.is_active = False
+        gmail_token.save()
+        api_client.force_authenticate(user=test_user)
+        response = api_client.get(reverse('email-list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'] == []
 
     def test_filter_emails_by_account(self, api_client, test_user, gmail_token, sample_email):
         """Test filtering emails by account."""
@@ -68,6 +88,16 @@ class TestEmailViewSet:
         assert len(results) >= 1
         assert results[0]['subject'] == sample_email.subject
 
+    def test_list_emails_cursor_paginated(self, api_client, test_user, gmail_token, sample_email):
+        """Test the email list is cursor paginated."""
+        api_client.force_authenticate(user=test_user)
+        url = reverse('email-list')
+        response = api_client.get(url)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data) == {'next', 'previous', 'results'}
+        assert response.data['results'][0]['id'] == sample_email.id
+
     def test_admin_sees_all_emails(self, api_client, admin_user, sample_email):
         """Test that admin users can see all emails."""
         api_client.force_authenticate(user=admin_user)
@@ -0,0 +1,33 @@
+import base64
+import pytest
+from gmail_integration.utils.encryption import EncryptionUtils
+
+
+@pytest.mark.unit
+class TestEncryptionUtils:
+    """Tests for token encryption."""
+
+    def test_round_trip(self):
+        """Test dicts and strings survive encrypt/decrypt."""
+        assert EncryptionUtils.decrypt(EncryptionUtils.encrypt({'token': 'abc'})) == {'token': 'abc'}
+        assert EncryptionUtils.decrypt(EncryptionUtils.encrypt('plain')) == 'plain'
+        assert EncryptionUtils.decrypt(EncryptionUtils.encrypt(['a', 1])) == ['a', 1]
+
+    def test_numeric_string_stays_string(self):
+        """Test plain strings are not re-parsed as JSON."""
+        assert EncryptionUtils.decrypt(EncryptionUtils.encrypt('123')) == '123'
+
+    def test_stores_fernet_token_directly(self):
+        """Test the stored value is the Fernet token itself."""
+        encrypted = EncryptionUtils.encrypt({'token': 'abc'})
+        assert EncryptionUtils.get_cipher().decrypt(encrypted.encode())
+
+    def test_decrypts_legacy_double_encoded_values(self):
+        """Test values written with the extra base64 layer still decrypt."""
+        token = EncryptionUtils.get_cipher().encrypt(b'{"token": "abc"}')
+        legacy = base64.urlsafe_b64encode(token).decode()
+        assert EncryptionUtils.decrypt(legacy) == {'token': 'abc'}
+
+    def test_invalid_value(self):
+        """Test unreadable values decrypt to None."""
+        assert EncryptionUtils.decrypt('not-a-token') is None
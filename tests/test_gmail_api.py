@@ -0,0 +1,472 @@
+import base64
+import pytest
+from email import message_from_bytes
+from unittest import mock
+from django.utils import timezone
+from gmail_integration.models import Attachment, Contact, Email, GmailToken, SyncStatus
+from gmail_integration.utils.gmail_api import (
+    create_message, extract_email_and_name, fetch_history_message_ids, fetch_messages_bulk,
+    get_html_cleaner, parse_email_body, parse_email_headers, parse_email_message, parse_recipients,
+    save_email_to_db, save_emails_to_db, save_messages, sync_account_emails, sync_all_emails,
+)
+
+
+class FakeBatch:
+    """Minimal stand-in for googleapiclient's BatchHttpRequest."""
+
+    def __init__(self, callback, failing_ids=()):
+        self.callback = callback
+        self.failing_ids = failing_ids
+        self.request_ids = []
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.request_ids.append(request_id)
+        self.requests.append(request)
+
+    def execute(self):
+        for request_id in self.request_ids:
+            if request_id in self.failing_ids:
+                self.callback(request_id, None, Exception('boom'))
+            else:
+                self.callback(request_id, {'id': request_id}, None)
+
+
+class FakeService:
+    """Minimal stand-in for the Gmail API service object."""
+
+    def __init__(self, failing_ids=()):
+        self.failing_ids = failing_ids
+        self.batches = []
+
+    def new_batch_http_request(self, callback):
+        batch = FakeBatch(callback, self.failing_ids)
+        self.batches.append(batch)
+        return batch
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, **kwargs):
+        return kwargs
+
+
+@pytest.mark.unit
+class TestFetchMessagesBulk:
+    """Tests for the batched message fetch helper."""
+
+    def test_chunks_requests(self):
+        """Test messages are fetched in chunks of batch_size."""
+        service = FakeService()
+        ids = [f'msg{i}' for i in range(5)]
+        chunks = list(fetch_messages_bulk(service, ids, batch_size=2))
+
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert [m['id'] for chunk in chunks for m in chunk] == ids
+        assert len(service.batches) == 3
+
+    def test_skips_failed_messages(self):
+        """Test failed batch parts are dropped from the chunk."""
+        service = FakeService(failing_ids={'msg1'})
+        chunks = list(fetch_messages_bulk(service, ['msg0', 'msg1', 'msg2']))
+
+        assert [m['id'] for m in chunks[0]] == ['msg0', 'msg2']
+
+    def test_requests_field_mask(self):
+        """Test messages are requested with the partial-response field mask."""
+        service = FakeService()
+        list(fetch_messages_bulk(service, ['msg0']))
+        part = 'partId,mimeType,filename,headers(name,value),body(data,attachmentId,size)'
+        assert service.batches[0].requests[0]['fields'] == (
+            f'id,threadId,snippet,labelIds,payload({part},parts({part},parts({part},parts({part},'
+            f'parts({part},parts)))))'
+        )
+
+        service = FakeService()
+        list(fetch_messages_bulk(service, ['msg0'], fields=None))
+        assert 'fields' not in service.batches[0].requests[0]
+
+
+@pytest.mark.unit
+class TestSaveMessages:
+    """Tests for the chunked fetch-and-save loop."""
+
+    def test_saves_every_chunk_in_order(self):
+        """Test each fetched chunk is parsed and saved in order while the next is prefetched."""
+        service = FakeService()
+        ids = [f'msg{i}' for i in range(45)]
+        saved_chunks = []
+
+        def fake_save(email_data_list, service=None):
+            saved_chunks.append([data['gmail_id'] for data in email_data_list])
+            return len(email_data_list)
+
+        with mock.patch('gmail_integration.utils.gmail_api.parse_email_message',
+                        side_effect=lambda message: {'gmail_id': message['id']}), \
+                mock.patch('gmail_integration.utils.gmail_api.save_emails_to_db', side_effect=fake_save):
+            assert save_messages(service, 'test@godamwale.com', ids) == 45
+
+        assert [len(chunk) for chunk in saved_chunks] == [20, 20, 5]
+        assert [gmail_id for chunk in saved_chunks for gmail_id in chunk] == ids
+
+
+@pytest.mark.unit
+class TestParseEmailHeaders:
+    """Tests for header extraction."""
+
+    HEADERS = [
+        {'name': 'Subject', 'value': 'Hello'},
+        {'name': 'From', 'value': 'Bob <bob@example.com>'},
+        {'name': 'X-Mailer', 'value': 'Thing'},
+    ]
+
+    def test_all_headers_lowercased(self):
+        """Test every header is kept under a lowercase key by default."""
+        headers = parse_email_headers(self.HEADERS)
+        assert headers == {
+            'subject': 'Hello',
+            'from': 'Bob <bob@example.com>',
+            'x-mailer': 'Thing',
+        }
+
+    def test_selected_headers(self):
+        """Test only the requested headers are kept."""
+        headers = parse_email_headers(self.HEADERS, {'subject'})
+        assert headers == {'subject': 'Hello'}
+
+
+@pytest.mark.unit
+class TestAddressParsing:
+    """Tests for sender and recipient address parsing."""
+
+    def test_extract_email_and_name(self):
+        """Test display names are split from addresses."""
+        assert extract_email_and_name('"Bob Smith" <bob@example.com>') == ('bob@example.com', 'Bob Smith')
+        assert extract_email_and_name('bob@example.com') == ('bob@example.com', '')
+        assert extract_email_and_name('') == ('', '')
+
+    def test_parse_recipients_with_comma_in_name(self):
+        """Test quoted display names containing commas stay one recipient."""
+        recipients = parse_recipients('a@example.com, "Smith, Bob" <bob@example.com>, Carol <carol@example.com>')
+        assert recipients == 'a@example.com, bob@example.com, carol@example.com'
+
+
+@pytest.mark.unit
+class TestCreateMessage:
+    """Tests for outgoing message assembly."""
+
+    def _parse(self, message):
+        return message_from_bytes(base64.urlsafe_b64decode(message['raw']))
+
+    def test_text_only_is_single_part(self):
+        """Test a message without attachments is a plain text/plain message."""
+        parsed = self._parse(create_message('me@example.com', 'to@example.com', 'Héllo', 'Body', cc='cc@example.com'))
+
+        assert parsed.get_content_type() == 'text/plain'
+        assert parsed['cc'] == 'cc@example.com'
+        assert parsed.get_payload(decode=True) == b'Body'
+
+    def test_attachments_use_multipart(self):
+        """Test attachments are sent alongside the text part."""
+        attachment = {'filename': 'a.txt', 'content': b'data', 'mimetype': 'text/plain'}
+        parsed = self._parse(create_message('me@example.com', 'to@example.com', 'Hi', 'Body', attachments=[attachment]))
+
+        assert parsed.get_content_type() == 'multipart/mixed'
+        assert [part.get_filename() for part in parsed.get_payload()] == [None, 'a.txt']
+
+
+def make_email_data(gmail_id, **overrides):
+    data = {
+        'gmail_id': gmail_id,
+        'thread_id': f'thread_{gmail_id}',
+        'subject': f'Subject {gmail_id}',
+        'date': timezone.now(),
+        'snippet': 'snippet',
+        'body_text': 'body',
+        'body_html': '<p>body</p>',
+        'labels': ['INBOX'],
+        'is_read': False,
+        'has_attachments': False,
+        'sender_email': 'sender@example.com',
+        'sender_name': 'Sender',
+        'recipient_list': ['to@example.com'],
+        'cc_list': [],
+        'bcc_list': [],
+        'attachments_metadata': [],
+        'account_email': 'test@godamwale.com',
+    }
+    data.update(overrides)
+    return data
+
+
+@pytest.mark.django_db
+class TestSaveEmailsToDb:
+    """Tests for bulk email saving."""
+
+    def test_creates_emails_contacts_and_recipients(self, gmail_token):
+        """Test a batch is saved with linked contacts and account."""
+        saved = save_emails_to_db([make_email_data('a'), make_email_data('b', cc_list=['cc@example.com'])])
+
+        assert saved == 2
+        email = Email.objects.get(gmail_id='b')
+        assert email.account_link == gmail_token
+        assert email.sender_contact.name == 'Sender'
+        assert sorted(c.email for c in email.recipients.all()) == ['cc@example.com', 'to@example.com']
+
+    def test_updates_existing_email(self, gmail_token):
+        """Test saving a known gmail_id updates it and replaces its recipients."""
+        save_emails_to_db([make_email_data('a')])
+        save_emails_to_db([make_email_data('a', subject='Changed', is_read=True, recipient_list=['new@example.com'])])
+
+        email = Email.objects.get(gmail_id='a')
+        assert email.subject == 'Changed'
+        assert email.is_read is True
+        assert [c.email for c in email.recipients.all()] == ['new@example.com']
+
+    def test_keeps_existing_contact_names(self, gmail_token):
+        """Test only empty contact names are filled in."""
+        Contact.objects.create(email='sender@example.com', name='Known Name')
+        Contact.objects.create(email='to@example.com', name='')
+
+        save_emails_to_db([make_email_data('a', sender_name='Other Name')])
+
+        assert Contact.objects.get(email='sender@example.com').name == 'Known Name'
+        assert Contact.objects.get(email='to@example.com').name == ''
+
+    def test_stores_new_attachment_metadata_once(self, gmail_token):
+        """Test attachment metadata is stored once per Gmail attachment."""
+        meta = [{'attachment_id': 'att1', 'filename': 'a.pdf', 'mime_type': 'application/pdf', 'size': 10}]
+        data = make_email_data('a', has_attachments=True, attachments_metadata=meta)
+
+        save_emails_to_db([data], service=object())
+        save_emails_to_db([data], service=object())
+
+        assert Attachment.objects.filter(email__gmail_id='a').count() == 1
+
+
+@pytest.mark.django_db
+class TestSaveEmailToDb:
+    """Tests for single-email saving."""
+
+    def test_saves_contacts_recipients_and_attachments(self, gmail_token, django_assert_max_num_queries):
+        """Test contacts and attachments are written in bulk, not one query per row."""
+        meta = [{'attachment_id': f'att{i}', 'filename': f'{i}.pdf', 'mime_type': 'application/pdf', 'size': 1}
+                for i in range(3)]
+        data = make_email_data(
+            'a', recipient_list=['to@example.com', 'x@example.com'], cc_list=['cc@example.com', 'to@example.com'],
+            has_attachments=True, attachments_metadata=meta,
+        )
+
+        with django_assert_max_num_queries(15):
+            email_obj, created = save_email_to_db(data, service=object())
+
+        assert created is True
+        assert email_obj.sender_contact.name == 'Sender'
+        assert sorted(c.email for c in email_obj.recipients.all()) == ['cc@example.com', 'to@example.com', 'x@example.com']
+        assert email_obj.attachments.count() == 3
+
+        email_obj, created = save_email_to_db(data, service=object())
+        assert created is False
+        assert Attachment.objects.filter(email__gmail_id='a').count() == 3
+
+
+@pytest.mark.unit
+class TestParseEmailBody:
+    """Tests for body extraction."""
+
+    def test_decodes_with_part_charset(self):
+        """Test bodies are decoded with the charset from their Content-Type."""
+        payload = {
+            'mimeType': 'text/plain',
+            'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset="ISO-8859-1"'}],
+            'body': {'data': 'Y2Fm6Q'},  # 'café' in latin-1, unpadded
+        }
+        assert parse_email_body(payload) == ('café', '')
+
+    def test_first_nested_bodies_win(self):
+        """Test the first text and HTML parts in document order are used."""
+        payload = {
+            'mimeType': 'multipart/mixed',
+            'parts': [
+                {'mimeType': 'multipart/alternative', 'parts': [
+                    {'mimeType': 'text/plain', 'body': {'data': 'b3V0ZXI'}},  # 'outer'
+                    {'mimeType': 'text/html', 'body': {'data': 'PGI-aGk8L2I-'}},
+                ]},
+                {'mimeType': 'message/rfc822', 'parts': [
+                    {'mimeType': 'text/plain', 'body': {'data': 'Zm9yd2FyZGVk'}},  # 'forwarded'
+                ]},
+            ],
+        }
+        assert parse_email_body(payload) == ('outer', '<b>hi</b>')
+
+    def test_unknown_charset_falls_back_to_utf8(self):
+        """Test an unrecognised charset label decodes as utf-8."""
+        payload = {
+            'mimeType': 'text/html',
+            'headers': [{'name': 'Content-Type', 'value': 'text/html; charset=bogus'}],
+            'body': {'data': 'PGI-aGk8L2I-'},  # '<b>hi</b>'
+        }
+        assert parse_email_body(payload) == ('', '<b>hi</b>')
+
+
+@pytest.mark.unit
+class TestParseEmailMessage:
+    """Tests for Gmail message parsing."""
+
+    def _message(self, parts):
+        return {
+            'id': 'msg1',
+            'threadId': 'thread1',
+            'labelIds': ['INBOX'],
+            'payload': {
+                'headers': [{'name': 'Date', 'value': 'Mon, 1 Jan 2024 10:00:00 +0000'}],
+                'parts': parts,
+            },
+        }
+
+    def test_nested_attachment_sets_has_attachments(self):
+        """Test attachments inside nested multipart parts are detected."""
+        parts = [{
+            'mimeType': 'multipart/mixed',
+            'parts': [{
+                'filename': 'report.pdf',
+                'mimeType': 'application/pdf',
+                'body': {'attachmentId': 'att1', 'size': 10},
+            }],
+        }]
+        data = parse_email_message(self._message(parts))
+
+        assert data['has_attachments'] is True
+        assert [a['attachment_id'] for a in data['attachments_metadata']] == ['att1']
+
+    def test_named_part_without_attachment_id(self):
+        """Test a named part with no downloadable attachment is not flagged."""
+        parts = [{'filename': 'inline.txt', 'mimeType': 'text/plain', 'body': {'size': 3}}]
+        data = parse_email_message(self._message(parts))
+
+        assert data['has_attachments'] is False
+
+    def test_html_is_sanitized(self):
+        """Test scripts and event handlers are stripped from HTML bodies."""
+        html = base64.urlsafe_b64encode(b'<p onclick="x()">Hi<script>alert(1)</script></p>').decode()
+        message = self._message([{'mimeType': 'text/html', 'body': {'data': html}}])
+
+        assert parse_email_message(message)['body_html'] == '<p>Hialert(1)</p>'
+
+    def test_html_cleaner_reused_per_thread(self):
+        """Test the sanitizer is built once per thread."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        assert get_html_cleaner() is get_html_cleaner()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(get_html_cleaner).result() is not get_html_cleaner()
+
+
+@pytest.mark.django_db
+class TestSyncAllEmails:
+    """Tests for the multi-account sync."""
+
+    def test_syncs_every_active_account(self, test_user, gmail_token):
+        """Test each active account is synced once and totals are summed."""
+        GmailToken.objects.create(user=test_user, email_account='second@godamwale.com', token_data={}, is_active=True)
+
+        def fake_sync(account_email, max_inbox, max_sent, incremental):
+            return {'inbox': max_inbox, 'sent': max_sent, 'total': max_inbox + max_sent}
+
+        with mock.patch('gmail_integration.utils.gmail_api.sync_account_emails', side_effect=fake_sync) as sync:
+            result = sync_all_emails(max_inbox=3, max_sent=2)
+
+        assert sync.call_count == 2
+        assert result['total'] == 10
+        assert sorted(result['accounts']) == ['second@godamwale.com', 'test@godamwale.com']
+
+
+    def test_failing_account_does_not_abort_others(self, test_user, gmail_token):
+        """Test an error in one account is recorded while the other accounts still sync."""
+        GmailToken.objects.create(user=test_user, email_account='broken@godamwale.com', token_data={}, is_active=True)
+
+        def fake_sync(account_email, max_inbox, max_sent, incremental):
+            if account_email == 'broken@godamwale.com':
+                raise RuntimeError('token revoked')
+            return {'inbox': 1, 'sent': 1, 'total': 2}
+
+        with mock.patch('gmail_integration.utils.gmail_api.sync_account_emails', side_effect=fake_sync):
+            result = sync_all_emails()
+
+        assert result['total'] == 2
+        assert result['accounts']['test@godamwale.com']['total'] == 2
+        assert result['accounts']['broken@godamwale.com']['error'] == 'token revoked'
+        failed = SyncStatus.get_latest(account_email='broken@godamwale.com')
+        assert failed.status == 'error'
+
+
+class FakeHistoryService:
+    """Gmail service stand-in serving users.history.list pages."""
+
+    def __init__(self, pages=(), error=None):
+        self.pages = list(pages)
+        self.error = error
+        self.calls = []
+
+    def users(self):
+        return self
+
+    def history(self):
+        return self
+
+    def list(self, **kwargs):
+        self.calls.append(kwargs)
+        return self
+
+    def execute(self):
+        if self.error:
+            raise self.error
+        return self.pages.pop(0)
+
+
+def history_change(message_id, labels):
+    return {'message': {'id': message_id, 'threadId': message_id, 'labelIds': labels}}
+
+
+@pytest.mark.django_db
+class TestIncrementalSync:
+    """Tests for history-based incremental sync."""
+
+    def test_history_ids_follow_synced_mail(self, sample_email):
+        """Test new inbox mail and changes to stored mail are kept, other mail is not."""
+        service = FakeHistoryService(pages=[
+            {'history': [{'messagesAdded': [history_change('new1', ['INBOX']), history_change('spam1', ['SPAM'])]}],
+             'nextPageToken': 'p2', 'historyId': '150'},
+            {'history': [{'labelsRemoved': [history_change(sample_email.gmail_id, ['CATEGORY_UPDATES'])]}],
+             'historyId': '200'},
+        ])
+
+        message_ids, history_id = fetch_history_message_ids(service, '100')
+
+        assert message_ids == ['new1', sample_email.gmail_id]
+        assert history_id == '200'
+        assert [call['pageToken'] for call in service.calls] == [None, 'p2']
+
+    def test_expired_history_id(self):
+        """Test a 404 from the history API reports the history ID as expired."""
+        from googleapiclient.errors import HttpError
+        service = FakeHistoryService(error=HttpError(mock.Mock(status=404), b''))
+
+        assert fetch_history_message_ids(service, '100') is None
+
+    def test_incremental_sync_saves_delta(self, sync_status):
+        """Test an incremental sync saves only history changes and records the new history ID."""
+        service = FakeHistoryService(pages=[{'history': [{'messagesAdded': [history_change('new1', ['INBOX'])]}],
+                                             'historyId': '200'}])
+        with mock.patch('gmail_integration.utils.gmail_auth.get_gmail_service', return_value=service), \
+                mock.patch('gmail_integration.utils.gmail_api.save_messages', return_value=1) as save, \
+                mock.patch('gmail_integration.utils.gmail_api.fetch_emails') as fetch:
+            result = sync_account_emails(sync_status.account_email, incremental=True)
+
+        save.assert_called_once_with(service, sync_status.account_email, ['new1'])
+        fetch.assert_not_called()
+        assert result['total'] == 1
+        assert SyncStatus.get_latest(account_email=sync_status.account_email).history_id == '200'
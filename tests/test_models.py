@@ -1,6 +1,8 @@
 import pytest
+from unittest import mock
 from django.contrib.auth.models import User
-from gmail_integration.models import Email, GmailToken, SyncStatus
+from gmail_integration.models import Attachment, Email, GmailToken, SyncStatus
+from gmail_integration.utils.encryption import EncryptionUtils
 from django.utils import timezone
 
 
@@ -58,6 +60,40 @@ class TestGmailToken:
         # Verify decryption works
         assert token.get_decrypted_token() == token_data
 
+    def test_save_token_for_user_replaces_legacy_plaintext(self, test_user, gmail_token):
+        """Test re-saving a token clears plaintext and stores the new token encrypted."""
+        token_data = {'token': 'rotated_token'}
+        GmailToken.save_token_for_user(
+            user=test_user,
+            email_account=gmail_token.email_account,
+            token_data=token_data
+        )
+        gmail_token.refresh_from_db()
+        assert gmail_token.token_data is None
+        assert gmail_token.get_decrypted_token() == token_data
+
+    def test_save_token_for_user_writes_once(self, test_user, gmail_token, django_assert_num_queries):
+        """Test updating a token issues a single UPDATE."""
+        with django_assert_num_queries(4) as captured:
+            GmailToken.save_token_for_user(
+                user=test_user,
+                email_account=gmail_token.email_account,
+                token_data={'token': 'rotated_token'}
+            )
+        writes = [q['sql'] for q in captured.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT'))]
+        assert len(writes) == 1
+
+    def test_get_decrypted_token_is_memoized(self, gmail_token):
+        """Test the token is decrypted once and re-decrypted after it changes."""
+        gmail_token.set_encrypted_token({'token': 'first'})
+        with mock.patch.object(EncryptionUtils, 'decrypt', wraps=EncryptionUtils.decrypt) as decrypt:
+            assert gmail_token.get_decrypted_token() == {'token': 'first'}
+            assert gmail_token.get_decrypted_token() == {'token': 'first'}
+            assert decrypt.call_count == 1
+
+        gmail_token.set_encrypted_token({'token': 'second'})
+        assert gmail_token.get_decrypted_token() == {'token': 'second'}
+
     def test_get_all_active_tokens(self, gmail_token):
         """Test getting all active tokens."""
         active_tokens = GmailToken.get_all_active_tokens()
@@ -94,6 +130,42 @@ class TestEmail:
         sample_email.save()
         assert sample_email.is_sent is True
 
+    def test_get_account_color_class(self, sample_email, gmail_token):
+        """Test the account color follows the token and its cache is invalidated."""
+        assert sample_email.get_account_color_class() == gmail_token.account_color
+        gmail_token.account_color = 'account-purple'
+        gmail_token.save()
+        assert sample_email.get_account_color_class() == 'account-purple'
+
+    def test_get_account_color_class_from_linked_token(self, sample_email, django_assert_num_queries):
+        """Test a select_related account_link is used without further queries."""
+        email = Email.objects.select_related('account_link').get(pk=sample_email.pk)
+        with django_assert_num_queries(0):
+            assert email.get_account_color_class() == sample_email.account_link.account_color
+
+    def test_get_account_color_class_shares_color_map(self, sample_email, gmail_token, django_assert_num_queries):
+        """Test unlinked emails across accounts cost at most one query in total."""
+        gmail_token.account_color = 'account-purple'
+        gmail_token.save()
+        sample_email.account_link = None
+        sample_email.save()
+        other = Email.objects.create(
+            account_email='other@godamwale.com',
+            gmail_id='other_gmail_id',
+            thread_id='other_thread',
+            date=timezone.now(),
+        )
+        emails = list(Email.objects.filter(pk__in=[sample_email.pk, other.pk]))
+
+        with django_assert_num_queries(1):
+            colors = [email.get_account_color_class() for email in emails * 3]
+        assert set(colors) == {'account-purple', 'account-gray'}
+
+    def test_get_account_color_class_unknown_account(self, sample_email):
+        """Test emails without a matching token fall back to gray."""
+        sample_email.account_email = 'unknown@example.com'
+        assert sample_email.get_account_color_class() == 'account-gray'
+
     def test_label_list_property(self, sample_email):
         """Test the label_list property."""
         labels = sample_email.label_list
@@ -134,3 +206,28 @@ class TestSyncStatus:
         latest = SyncStatus.get_latest()
         assert latest is not None
         assert latest.account_email == sync_status.account_email
+
+    def test_get_latest_sync_status_for_account(self, sync_status):
+        """Test getting the latest sync status for a single account."""
+        SyncStatus.create_sync_record(account_email='other@example.com')
+        latest = SyncStatus.get_latest(account_email=sync_status.account_email)
+        assert latest.pk == sync_status.pk
+        assert SyncStatus.get_latest(account_email='missing@example.com') is None
+
+
+@pytest.mark.django_db
+class TestAttachment:
+    """Tests for the Attachment model."""
+
+    @pytest.mark.parametrize('mime_type, icon', [
+        ('application/pdf', '📄'),
+        ('image/png', '🖼️'),
+        ('application/vnd.openxmlformats-officedocument.wordprocessingml.document', '📝'),
+        ('application/vnd.ms-excel', '📊'),
+        ('application/zip', '📦'),
+        ('text/plain', '📎'),
+    ])
+    def test_icon_class(self, sample_email, mime_type, icon):
+        """Test the icon is picked from the MIME type."""
+        attachment = Attachment(email=sample_email, filename='f', mime_type=mime_type, size_bytes=1)
+        assert attachment.icon_class == icon
@@ -19,6 +19,18 @@ class TestEmailSerializer:
         assert data['account_email'] == sample_email.account_email
         assert data['gmail_id'] == sample_email.gmail_id
 
+    def test_email_serialization_recipients(self, sample_email):
+        """Test recipients serialize as contact IDs."""
+        data = EmailSerializer(sample_email).data
+        assert data['recipients'] == [c.id for c in sample_email.recipients.all()]
+
+    def test_email_serialization_aggregated_recipients(self, sample_email, django_assert_num_queries):
+        """Test an aggregated recipient_ids annotation is used without querying the M2M."""
+        sample_email.recipient_ids = [42, 43]
+        with django_assert_num_queries(0):
+            data = EmailSerializer(sample_email).data
+        assert data['recipients'] == [42, 43]
+
     def test_email_deserialization(self, gmail_token):
         """Test deserializing email data."""
         email_data = {
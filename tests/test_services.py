@@ -0,0 +1,315 @@
+import pytest
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.urls import reverse
+from gmail_integration.models import Attachment, Email, GmailToken
+from gmail_integration.services import ATTACHMENT_CACHE_ALIAS, ATTACHMENT_CACHE_MAX_BYTES, EmailService
+from gmail_integration.tasks import sync_account_task, sync_emails_task, sync_sent_folder_task
+from gmail_integration.utils.gmail_auth import build_gmail_service, get_accessible_accounts, is_authenticated_for_account
+
+
+@pytest.mark.django_db
+class TestGetThreadsForUser:
+    """Tests for thread listing."""
+
+    def _add_reply(self, email, gmail_id, minutes):
+        return Email.objects.create(
+            account_email=email.account_email,
+            account_link=email.account_link,
+            gmail_id=gmail_id,
+            thread_id=email.thread_id,
+            subject=f'Re: {email.subject}',
+            sender_contact=email.sender_contact,
+            date=email.date + timedelta(minutes=minutes),
+            snippet=f'reply {gmail_id}',
+            labels=['INBOX'],
+        )
+
+    def test_latest_email_per_thread(self, test_user, sample_email):
+        """Test each thread is represented by its latest email and count."""
+        reply = self._add_reply(sample_email, 'reply_1', 5)
+
+        thread_list, page_obj, _ = EmailService.get_threads_for_user(test_user)
+
+        assert len(thread_list) == 1
+        thread = thread_list[0]
+        assert thread['thread_id'] == sample_email.thread_id
+        assert thread['message_count'] == 2
+        assert thread['latest_email'] == reply
+        assert thread['latest_snippet'] == 'reply reply_1'
+        assert page_obj.paginator.count == 1
+
+    def test_account_color_without_extra_queries(self, test_user, sample_email, django_assert_num_queries):
+        """Test the account badge color comes from the joined token."""
+        thread_list, _, _ = EmailService.get_threads_for_user(test_user)
+
+        with django_assert_num_queries(0):
+            color = thread_list[0]['latest_email'].get_account_color_class()
+        assert color == sample_email.account_link.account_color
+
+    def test_bodies_not_loaded(self, test_user, sample_email):
+        """Test the thread list skips the large body columns."""
+        thread_list, _, _ = EmailService.get_threads_for_user(test_user)
+
+        deferred = thread_list[0]['latest_email'].get_deferred_fields()
+        assert {'body_text', 'body_html'} <= deferred
+
+    def test_threads_ordered_by_latest_date(self, test_user, sample_email):
+        """Test threads are listed newest first."""
+        Email.objects.create(
+            account_email=sample_email.account_email,
+            account_link=sample_email.account_link,
+            gmail_id='other_gmail_id',
+            thread_id='other_thread',
+            subject='Older thread',
+            date=sample_email.date - timedelta(days=1),
+        )
+
+        thread_list, _, _ = EmailService.get_threads_for_user(test_user)
+
+        assert [t['thread_id'] for t in thread_list] == [sample_email.thread_id, 'other_thread']
+
+    def test_search_counts_each_email_once(self, test_user, sample_email):
+        """Test search across recipients does not inflate message counts."""
+        reply = self._add_reply(sample_email, 'reply_1', 5)
+        reply.recipients.set(sample_email.recipients.all())
+
+        thread_list, _, _ = EmailService.get_threads_for_user(test_user, search_query='example.com')
+
+        assert len(thread_list) == 1
+        assert thread_list[0]['message_count'] == 2
+
+    def test_thread_count_is_cached(self, test_user, sample_email, django_assert_num_queries):
+        """Test repeated listings reuse the cached thread count."""
+        EmailService.get_threads_for_user(test_user)
+
+        # Only the page query, no COUNT
+        with django_assert_num_queries(1):
+            _, page_obj, _ = EmailService.get_threads_for_user(test_user)
+        assert page_obj.paginator.count == 1
+
+    def test_search_matches_recipient(self, test_user, sample_email):
+        """Test search finds threads by recipient name."""
+        thread_list, _, _ = EmailService.get_threads_for_user(test_user, search_query='Test User')
+        assert [t['thread_id'] for t in thread_list] == [sample_email.thread_id]
+
+        thread_list, _, _ = EmailService.get_threads_for_user(test_user, search_query='nobody')
+        assert thread_list == []
+
+    def test_search_matches_sender(self, test_user, sample_email):
+        """Test search finds threads by sender name, case-insensitively."""
+        thread_list, _, _ = EmailService.get_threads_for_user(test_user, search_query='test sender')
+        assert [t['thread_id'] for t in thread_list] == [sample_email.thread_id]
+
+
+@pytest.mark.django_db
+class TestGetThreadEmails:
+    """Tests for thread access checks."""
+
+    def test_owner_can_view_thread(self, test_user, sample_email, django_assert_num_queries):
+        """Test the account owner gets the thread's emails."""
+        # user + group permissions, accessible accounts, then the thread itself
+        with django_assert_num_queries(4):
+            emails = EmailService.get_thread_emails(test_user, sample_email.thread_id)
+        assert emails == [sample_email]
+
+    def test_other_user_cannot_view_thread(self, sample_email):
+        """Test users without the account are denied."""
+        other = User.objects.create_user(username='other', password='pass12345')
+        assert EmailService.get_thread_emails(other, sample_email.thread_id) is None
+
+    def test_accessible_accounts_memoized_on_user(self, test_user, gmail_token, django_assert_num_queries):
+        """Test repeated access checks in one request share a query."""
+        get_accessible_accounts(test_user)
+        with django_assert_num_queries(0):
+            assert is_authenticated_for_account(test_user, gmail_token.email_account)
+            assert not is_authenticated_for_account(test_user, 'someone@else.com')
+
+    def test_accessible_accounts_not_shared_across_requests(self, test_user, gmail_token, admin_user):
+        """Test a fresh user object sees permission and token changes immediately."""
+        assert get_accessible_accounts(admin_user) == {gmail_token.email_account}
+
+        admin_user.is_superuser = False
+        admin_user.save()
+        assert get_accessible_accounts(User.objects.get(pk=admin_user.pk)) == frozenset()
+
+        GmailToken.objects.create(user=test_user, email_account='second@godamwale.com', is_active=True)
+        fresh = User.objects.get(pk=test_user.pk)
+        assert get_accessible_accounts(fresh) == {gmail_token.email_account, 'second@godamwale.com'}
+
+
+@pytest.mark.django_db
+class TestProcessThreadAttachments:
+    """Tests for thread attachment de-duplication."""
+
+    def _add_attachment(self, email, attachment_id, filename):
+        return Attachment.objects.create(
+            email=email,
+            gmail_attachment_id=attachment_id,
+            filename=filename,
+            mime_type='application/pdf',
+            size_bytes=100,
+        )
+
+    def test_dedupes_by_filename_per_email(self, sample_email, django_assert_num_queries):
+        """Test each email keeps its first attachment per filename, in id order, in one query."""
+        first = self._add_attachment(sample_email, 'att1', 'report.pdf')
+        self._add_attachment(sample_email, 'att2', 'report.pdf')
+        other = self._add_attachment(sample_email, 'att3', 'annex.pdf')
+        emails = list(Email.objects.filter(thread_id=sample_email.thread_id))
+
+        with django_assert_num_queries(1):
+            EmailService.process_thread_attachments(emails)
+        assert emails[0].unique_attachments == [first, other]
+
+
+@pytest.mark.django_db
+class TestGetAttachmentContent:
+    """Tests for attachment downloads."""
+
+    def _attachment(self, email):
+        return Attachment.objects.create(
+            email=email,
+            gmail_attachment_id='att1',
+            filename='report.pdf',
+            mime_type='application/pdf',
+            size_bytes=7,
+        )
+
+    def test_repeat_download_served_from_cache(self, test_user, sample_email):
+        """Test a recent download is reused without writing anything to storage."""
+        attachment = self._attachment(sample_email)
+
+        with mock.patch('gmail_integration.utils.gmail_auth.get_gmail_service', return_value=object()), \
+                mock.patch('gmail_integration.utils.gmail_api.download_attachment', return_value=b'content') as download:
+            _, first = EmailService.get_attachment_content(test_user, attachment.id)
+            _, second = EmailService.get_attachment_content(test_user, attachment.id)
+
+        assert first.read() == b'content'
+        assert second.read() == b'content'
+        assert download.call_count == 1
+        attachment.refresh_from_db()
+        assert not attachment.file
+
+    def test_cached_content_requires_permission(self, test_user, sample_email):
+        """Test cached content is not returned to users without access to the account."""
+        attachment = self._attachment(sample_email)
+        other = User.objects.create_user(username='other', password='pass')
+
+        with mock.patch('gmail_integration.utils.gmail_auth.get_gmail_service', return_value=object()), \
+                mock.patch('gmail_integration.utils.gmail_api.download_attachment', return_value=b'content'):
+            EmailService.get_attachment_content(test_user, attachment.id)
+
+        assert EmailService.get_attachment_content(other, attachment.id) == (None, None)
+
+    def test_content_kept_out_of_default_cache(self, test_user, sample_email):
+        """Test attachment bytes go to the dedicated alias, not the shared default cache."""
+        attachment = self._attachment(sample_email)
+
+        with mock.patch('gmail_integration.utils.gmail_auth.get_gmail_service', return_value=object()), \
+                mock.patch('gmail_integration.utils.gmail_api.download_attachment', return_value=b'content'):
+            EmailService.get_attachment_content(test_user, attachment.id)
+
+        content_key = f'gmail_attachment_content:{attachment.pk}'
+        assert cache.get(content_key) is None
+        assert caches[ATTACHMENT_CACHE_ALIAS].get(content_key) == b'content'
+
+    def test_over_cap_file_is_never_cached(self, test_user, sample_email):
+        """Test files larger than ATTACHMENT_CACHE_MAX_BYTES are downloaded every time."""
+        attachment = self._attachment(sample_email)
+        large = b'x' * (ATTACHMENT_CACHE_MAX_BYTES + 1)
+
+        with mock.patch('gmail_integration.utils.gmail_auth.get_gmail_service', return_value=object()), \
+                mock.patch('gmail_integration.utils.gmail_api.download_attachment', return_value=large) as download:
+            _, first = EmailService.get_attachment_content(test_user, attachment.id)
+            _, second = EmailService.get_attachment_content(test_user, attachment.id)
+
+        assert first.read() == large
+        assert second.read() == large
+        assert download.call_count == 2
+        assert caches[ATTACHMENT_CACHE_ALIAS].get(f'gmail_attachment_content:{attachment.pk}') is None
+
+
+@pytest.mark.django_db
+class TestSendEmail:
+    """Tests for sending email."""
+
+    def test_sent_folder_sync_is_queued(self, test_user, gmail_token):
+        """Test the Sent folder sync runs in the background, not inline."""
+        with mock.patch('gmail_integration.utils.gmail_auth.get_gmail_service', return_value=object()), \
+                mock.patch('gmail_integration.utils.gmail_api.create_message', return_value={'raw': ''}), \
+                mock.patch('gmail_integration.utils.gmail_api.send_email', return_value={'id': 'sent1'}), \
+                mock.patch('gmail_integration.utils.gmail_api.fetch_emails') as fetch, \
+                mock.patch('django_q.tasks.async_task') as queue:
+            sent = EmailService.send_email(
+                test_user, gmail_token.email_account, 'to@example.com', 'Hi', 'Body'
+            )
+
+        assert sent is True
+        fetch.assert_not_called()
+        queue.assert_called_once_with(sync_sent_folder_task, gmail_token.email_account)
+
+    def test_cannot_send_from_foreign_account(self, test_user):
+        """Test users cannot send as accounts they don't own."""
+        assert EmailService.send_email(test_user, 'other@example.com', 'to@example.com', 'Hi', 'Body') is False
+
+
+@pytest.mark.django_db
+class TestSyncEmailsTask:
+    """Tests for the scheduled sync fan-out."""
+
+    def test_queues_one_task_per_active_account(self, test_user, gmail_token):
+        """Test each active account gets its own sync task."""
+        GmailToken.objects.create(user=test_user, email_account='second@godamwale.com', token_data={}, is_active=True)
+        GmailToken.objects.create(user=test_user, email_account='off@godamwale.com', token_data={}, is_active=False)
+
+        with mock.patch('gmail_integration.tasks.async_task') as queue:
+            queued = sync_emails_task(max_inbox=10, max_sent=5)
+
+        assert queued == 2
+        assert queue.call_args_list == [
+            mock.call(sync_account_task, 'second@godamwale.com', 10, 5, group='gmail-sync'),
+            mock.call(sync_account_task, 'test@godamwale.com', 10, 5, group='gmail-sync'),
+        ]
+
+
+@pytest.mark.unit
+class TestBuildGmailService:
+    """Tests for Gmail service construction."""
+
+    def test_discovery_doc_read_once(self):
+        """Test the discovery document is loaded once and each call gets its own service."""
+        from google.oauth2.credentials import Credentials
+        from gmail_integration.utils import gmail_auth
+
+        gmail_auth._gmail_discovery_doc.cache_clear()
+        creds = Credentials('token')
+        with mock.patch.object(gmail_auth.discovery_cache, 'get_static_doc',
+                               wraps=gmail_auth.discovery_cache.get_static_doc) as get_doc:
+            first = build_gmail_service(creds)
+            second = build_gmail_service(creds)
+
+        assert get_doc.call_count == 1
+        assert first is not second
+        assert hasattr(first.users(), 'messages')
+
+
+@pytest.mark.django_db
+class TestInboxRowCache:
+    """Tests for the cached inbox row fragment."""
+
+    def test_row_refreshes_when_sender_name_or_color_changes(self, client, test_user, sample_email):
+        """Test the row cache key covers the sender contact and account color."""
+        client.force_login(test_user)
+        client.get(reverse('inbox'))
+
+        contact = sample_email.sender_contact
+        contact.name = 'Renamed Sender'
+        contact.save()
+        GmailToken.objects.filter(pk=sample_email.account_link_id).update(account_color='account-red')
+
+        content = client.get(reverse('inbox')).content.decode()
+        assert 'Renamed Sender' in content
+        assert 'account-red' in content